@@ -3,10 +3,12 @@ from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from models import ChatRequest
-from src.utils.full_chain import get_response
+from src.utils.full_chain import aget_response, embedding_model, CHAT_DEADLINE_SECONDS
+from src.utils.deadline import Deadline
 from typing import AsyncGenerator, List, Dict, Any
 from src.utils.redis import chat_history_manager
-from src.utils.Vector_db import get_existing_namespaces
+from src.utils.Vector_db import get_existing_namespaces, encode_namespace
+from src.utils.faq import AsyncFAQLookup
 from dotenv import load_dotenv
 import uvicorn
 import asyncio
@@ -25,6 +27,8 @@ allow_headers = os.getenv("ALLOW_HEADERS", True)
 port = int(os.getenv("PORT", 8080))
 host = os.getenv("HOST", "0.0.0.0")
 
+faq_lookup = AsyncFAQLookup()
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("🚀 Starting up FastAPI app...")
@@ -39,6 +43,7 @@ async def lifespan(app: FastAPI):
 
     logger.info("🛑 Shutting down FastAPI app...")
     await chat_history_manager.close()
+    await faq_lookup.close()
     logger.info("✅ Redis connection closed")
 
 
@@ -73,6 +78,7 @@ async def get_chat_messages(namespace: str, session_id: str):
 
 @app.post("/api/chat/{namespace}/{session_id}/message")
 async def chat_endpoint(namespace: str, session_id: str, request: ChatRequest):
+    deadline = Deadline(CHAT_DEADLINE_SECONDS)
     try:
         # Get existing chat history in text form for RAG
         try:
@@ -81,13 +87,26 @@ async def chat_endpoint(namespace: str, session_id: str, request: ChatRequest):
             logger.error(f"[ERROR] Error While getting messages from redis server: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
-        # Process the chat through your RAG system
+        # Serve precomputed answers to frequently asked questions without running the chain
+        faq_entry = None
         try:
-            rag_response = get_response(request.content, rag_history, namespace)
-            logger.info(f"[DEBUG] Namespace: {namespace}")
+            faq_entry = await faq_lookup.find(encode_namespace(namespace), request.content, embedding_model.embed_query)
         except Exception as e:
-            logger.error(f"[ERROR] Error While getting RAG response: {str(e)}")
-            raise HTTPException(status_code=500, detail=str(e))
+            logger.warning(f"[WARN] FAQ lookup failed, falling back to RAG: {str(e)}")
+
+        if faq_entry is not None:
+            logger.info(f"[DEBUG] Serving precomputed FAQ answer for namespace: {namespace}")
+            rag_response = {"answer": faq_entry["answer"]}
+        else:
+            # Process the chat through your RAG system
+            try:
+                rag_response = await aget_response(request.content, rag_history, namespace, deadline=deadline)
+                logger.info(f"[DEBUG] Namespace: {namespace}")
+                if rag_response["degraded"]:
+                    logger.warning(f"[WARN] Deadline expired, served an extractive answer for namespace: {namespace}")
+            except Exception as e:
+                logger.error(f"[ERROR] Error While getting RAG response: {str(e)}")
+                raise HTTPException(status_code=500, detail=str(e))
 
         try:
             # Save the human message
@@ -108,6 +127,7 @@ async def chat_endpoint(namespace: str, session_id: str, request: ChatRequest):
 
         return JSONResponse({
             "response": rag_response['answer'],
+            "degraded": rag_response.get("degraded", False),
             "session_id": session_id,
             "namespace": namespace,
             "messages": messages
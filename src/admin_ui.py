@@ -1,11 +1,15 @@
 import os
+import shutil
+import tempfile
 import streamlit as st
 import streamlit_authenticator as stauth
 import yaml
 from yaml.loader import SafeLoader
-from utils.Load_data import loading_data
-from utils.Vector_db import add_documents_to_pinecone, delete_vectors_by_source, get_existing_namespaces
-import base64
+from utils.Vector_db import delete_vectors_by_source, get_existing_namespaces, encode_namespace
+from utils.ingestion_jobs import ingestion_queue, UPLOAD_DIR
+from utils.faq import faq_store
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1 MiB
 
 with open("src/admin_auth.yaml") as file:
     config = yaml.load(file, Loader=SafeLoader)
@@ -16,6 +20,56 @@ authenticator = stauth.Authenticate(
     config["cookie"]["expiry_days"]
 )
 
+def save_uploads(uploaded_files) -> list:
+    """
+    Stream uploaded files to disk where the ingestion workers can read them. Each upload gets its own
+    temporary directory, so files keep their original name (used as the vectors' `source`) without
+    colliding with concurrent uploads of the same filename.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    upload_dir = tempfile.mkdtemp(dir=UPLOAD_DIR)
+    file_paths = []
+    for path in uploaded_files:
+        file_path = os.path.join(upload_dir, os.path.basename(path.name))
+        path.seek(0)
+        with open(file_path, "wb") as upload:
+            shutil.copyfileobj(path, upload, UPLOAD_CHUNK_SIZE)
+        file_paths.append(file_path)
+    return file_paths
+
+@st.fragment(run_every=3)
+def render_ingestion_jobs():
+    """Show the progress of recent ingestion jobs, refreshed every few seconds"""
+    st.markdown("### ⏳ Ingestion Jobs")
+    try:
+        jobs = ingestion_queue.list_jobs(limit=10)
+    except Exception as e:
+        st.error(f"❌ Error loading ingestion jobs: {e}")
+        return
+
+    if not jobs:
+        st.write("No ingestion jobs yet.")
+        return
+
+    status_icons = {"queued": "🕒", "running": "⚙️", "completed": "✅", "failed": "❌"}
+    for job in jobs:
+        namespace = job["namespace"] or "(Default)"
+        if job["kind"] == "faq_warm":
+            st.write(f"{status_icons.get(job['status'], '')} **{namespace}**: FAQ answers, {job['files_done']} computed ({job['status']})")
+            if job["status"] == "failed":
+                st.error(f"Error: {job['error']}")
+            continue
+        total_files = len(job["files"])
+        file_names = ", ".join(os.path.basename(file_path) for file_path in job["files"])
+        st.write(f"{status_icons.get(job['status'], '')} **{namespace}**: {file_names}")
+        progress = job["files_done"] / total_files if total_files else 1.0
+        st.progress(progress, text=f"{job['files_done']}/{total_files} files, {job['chunks_done']} chunks stored ({job['status']})")
+        if job["status"] == "failed":
+            st.error(f"Error: {job['error']}")
+            if st.button("🔁 Retry", key=f"retry_{job['id']}"):
+                ingestion_queue.retry(job["id"])
+                st.rerun(scope="fragment")
+
 def main():
     st.set_page_config(layout="wide", page_icon="🤖", page_title="Admin RAG UI")
     st.title("`Admin RAG UI`")
@@ -74,7 +128,7 @@ def main():
                 key="new_namespace_input",
                 help="Enter a name for the new namespace"
             )
-            new_namespace = base64.urlsafe_b64encode(new_namespace.replace(" ", "-").lower().encode("utf-8")).decode("ascii") # Pinecone namespaces must be ASCII encoded
+            new_namespace = encode_namespace(new_namespace) # Pinecone namespaces must be ASCII encoded
             
             new_namespace_files = st.file_uploader(
                 "Upload files for new namespace:", 
@@ -91,34 +145,11 @@ def main():
                         st.sidebar.warning("Please upload files to create the new namespace")
                     else:
                         try:
-                            # Process files and create namespace
-                            file_paths = []
-                            for path in new_namespace_files:
-                                temp_file_path = os.path.join(os.getcwd(), path.name)
-                                with open(temp_file_path, "wb") as temp_file:
-                                    temp_file.write(path.read())
-                                file_paths.append(temp_file.name)
-                            
-                            with st.spinner(f"Creating namespace '{new_namespace}' and uploading files..."):
-                                data = loading_data(file_paths=file_paths)
-                                st.sidebar.write(f"📄 Processed {len(data)} document chunks")
-                                _ = add_documents_to_pinecone(
-                                    documents=data, 
-                                    namespace=new_namespace
-                                )
-                                # Clean up temporary files
-                                for file_path in file_paths:
-                                    if os.path.exists(file_path):
-                                        os.remove(file_path)
-                                
-                                st.sidebar.success(f"✅ Created namespace '{new_namespace}' with {len(data)} document chunks!")
-                                st.rerun()  # Refresh to show the new namespace
+                            file_paths = save_uploads(new_namespace_files)
+                            ingestion_queue.enqueue(file_paths, namespace=new_namespace)
+                            st.sidebar.success(f"✅ Queued {len(file_paths)} file(s) for namespace '{new_namespace}'. It will appear once ingestion starts.")
                         except Exception as e:
                             st.sidebar.error(f"Error creating namespace: {e}")
-                            # Clean up temporary files even if there's an error
-                            for file_path in file_paths:
-                                if os.path.exists(file_path):
-                                    os.remove(file_path)
                 else:
                     st.sidebar.warning("Please enter a namespace name and upload files")
         
@@ -136,36 +167,18 @@ def main():
         
         if st.sidebar.button("📥 Upload to Selected Namespace", key="upload_btn"):
             if existing_namespace_files:
-                file_paths = []
-                for path in existing_namespace_files:
-                    temp_file_path = os.path.join(os.getcwd(), path.name)
-                    with open(temp_file_path, "wb") as temp_file:
-                        temp_file.write(path.read())
-                    file_paths.append(temp_file.name)
-                        
-                with st.spinner(f"Uploading files to '{namespace_display}'..."):
-                    try:
-                        data = loading_data(file_paths=file_paths)
-                        st.write(f"📄 Processed {len(data)} document chunks")
-                        _ = add_documents_to_pinecone(
-                            documents=data, 
-                            namespace=selected_namespace if selected_namespace else None
-                        )
-                        # Clean up temporary files
-                        for file_path in file_paths:
-                            if os.path.exists(file_path):
-                                os.remove(file_path)
-                        st.success(f"✅ Files uploaded to **{namespace_display}** successfully! 📁")
-                    except Exception as e:
-                        st.error(f"❌ Error processing files: {e}")
-                        # Clean up temporary files even if there's an error
-                        for file_path in file_paths:
-                            if os.path.exists(file_path):
-                                os.remove(file_path)
+                try:
+                    file_paths = save_uploads(existing_namespace_files)
+                    ingestion_queue.enqueue(file_paths, namespace=selected_namespace if selected_namespace else None)
+                    st.sidebar.success(f"✅ Queued {len(file_paths)} file(s) for **{namespace_display}** 📁")
+                except Exception as e:
+                    st.sidebar.error(f"❌ Error queueing files: {e}")
             else:
                 st.sidebar.warning("⚠️ Please upload files first.")
         
         # ===== MAIN CONTENT AREA =====
+        render_ingestion_jobs()
+
         st.markdown("### 🔥 Delete Vectors by Document Name")
         
         # Show current namespace context
@@ -187,11 +200,39 @@ def main():
                             namespace_for_delete = selected_namespace if selected_namespace else ""
                             delete_vectors_by_source(doc_name, namespace=namespace_for_delete)
                             st.success(f"✅ Vectors with source `{doc_name}` deleted from **{namespace_display}** successfully.")
+                            faq_store.schedule_warmup(namespace_for_delete)
                         except Exception as e:
                             st.error(f"❌ Error deleting vectors: {e}")
                 else:
                     st.warning("⚠️ Please enter a valid document name.")
         
+        # ===== FREQUENTLY ASKED QUESTIONS =====
+        st.markdown("### 💬 Frequently Asked Questions")
+        st.caption("Answers to these questions are precomputed after every upload or deletion in this namespace, and served instantly in the chat.")
+        try:
+            faq_questions = faq_store.get_questions(selected_namespace)
+        except Exception as e:
+            st.error(f"❌ Error loading questions: {e}")
+            faq_questions = []
+
+        with st.form("faq_form"):
+            faq_text = st.text_area(
+                "Canonical questions (one per line)",
+                value="\n".join(faq_questions),
+                height=200,
+                key=f"faq_questions_{selected_namespace}"
+            )
+            if st.form_submit_button("💾 Save & Precompute Answers"):
+                try:
+                    faq_store.set_questions(selected_namespace, faq_text.splitlines())
+                    if faq_store.schedule_warmup(selected_namespace):
+                        st.success(f"✅ Questions saved, answers for **{namespace_display}** are being precomputed.")
+                    else:
+                        faq_store.replace_answers(selected_namespace, [])
+                        st.success("✅ Questions cleared.")
+                except Exception as e:
+                    st.error(f"❌ Error saving questions: {e}")
+
         # ===== NAMESPACE INFORMATION =====
         st.sidebar.markdown("---")
         st.sidebar.subheader("📊 Namespace Info")
@@ -0,0 +1,67 @@
+"""
+Checks against a real Redis (REDIS_URL) that the chat history L1 cache stays coherent: a session cached by one
+manager must be evicted when another client writes to or deletes it. Uses a throwaway session and removes it.
+
+Usage:
+    python src/check_chat_l1_cache.py
+"""
+import sys
+import uuid
+import asyncio
+import logging
+import redis.asyncio as redis
+from utils.redis import AsyncRedisChatManager, REDIS_URL
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+INVALIDATION_WAIT = 2  # seconds
+
+async def wait_until(condition) -> bool:
+    for _ in range(int(INVALIDATION_WAIT / 0.05)):
+        if condition():
+            return True
+        await asyncio.sleep(0.05)
+    return condition()
+
+async def main() -> bool:
+    manager = AsyncRedisChatManager(l1_cache=True)
+    other = redis.Redis.from_url(REDIS_URL)
+    await manager.initialize()
+    namespace, session_id = "l1-check", uuid.uuid4().hex
+    key = manager._get_session_key(session_id=session_id, namespace=namespace)
+    try:
+        if not await wait_until(lambda: manager._l1_active):
+            logger.error("❌ The L1 cache did not become active")
+            return False
+
+        await manager.add_human_message(session_id, namespace, "first")
+        await manager.get_messages(session_id, namespace)
+        if key not in manager._l1:
+            logger.error("❌ The session was not cached")
+            return False
+
+        # A write from another client (another worker, a replica, the migration script) must evict the session
+        await other.rpush(key, b'{"isBot": "ai", "content": "second", "timestamp": 0}')
+        if not await wait_until(lambda: key not in manager._l1):
+            logger.error("❌ A write from another client did not evict the cached session")
+            return False
+        if [message["content"] for message in await manager.get_messages(session_id, namespace)] != ["second", "first"]:
+            logger.error("❌ The history read after the write is stale")
+            return False
+
+        # So must a deletion
+        await other.delete(key)
+        if not await wait_until(lambda: key not in manager._l1):
+            logger.error("❌ A deletion from another client did not evict the cached session")
+            return False
+
+        logger.info("✅ The chat history L1 cache is evicted by writes and deletions from other clients")
+        return True
+    finally:
+        await other.delete(key)
+        await other.aclose()
+        await manager.close()
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(main()) else 1)
@@ -0,0 +1,29 @@
+"""
+Reports how many chunks the embedding model truncates with the previous character-based splitting and with
+the token-aware splitting.
+
+Usage:
+    python src/chunking_report.py book.pdf [other.docx ...]
+"""
+import json
+import argparse
+import logging
+from utils.Load_data import chunking_report, EMBEDDING_MAX_TOKENS
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare chunk truncation before and after token-aware chunking")
+    parser.add_argument("files", nargs="+", help="Files to split (.pdf, .docx, .txt)")
+    args = parser.parse_args()
+
+    report = chunking_report(args.files)
+    for name in ("before", "after"):
+        stats = report[name]
+        logger.info(f"📊 {name}: {stats['truncated']}/{stats['chunks']} chunks over {EMBEDDING_MAX_TOKENS} tokens, "
+                    f"{stats['dropped_tokens']}/{stats['tokens']} tokens never embedded")
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
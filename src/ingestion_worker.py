@@ -0,0 +1,148 @@
+import os
+import shutil
+import socket
+import logging
+import threading
+from utils.Load_data import iter_chunks, iter_documents
+from utils.Vector_db import upsert_documents_in_batches, get_embedding_model, decode_namespace
+from utils.ingestion_jobs import ingestion_queue, UPLOAD_DIR
+from utils.faq import faq_store
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_INTERVAL = 30
+WORKER_NAME = f"{socket.gethostname()}:{os.getpid()}"
+# FAQ answers are precomputed offline, so they can wait longer than a chat request before falling back
+FAQ_ANSWER_DEADLINE_SECONDS = 120
+
+def _keep_alive(job_id: str, stop: threading.Event):
+    """Send heartbeats for a job until `stop` is set"""
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        try:
+            ingestion_queue.heartbeat(job_id)
+        except Exception as e:
+            logger.warning(f"⚠️ Heartbeat failed for job {job_id}: {e}")
+
+def _remove_uploads(file_paths):
+    """Delete a job's uploaded files once they are no longer needed"""
+    for file_path in file_paths:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        # Uploads live in their own directory under UPLOAD_DIR
+        directory = os.path.dirname(file_path)
+        if os.path.abspath(os.path.dirname(directory)) == os.path.abspath(UPLOAD_DIR):
+            shutil.rmtree(directory, ignore_errors=True)
+
+def process_ingest_job(job: dict):
+    """
+    Load, split and upsert every file of a job, resuming from its checkpoint.
+
+    Files before `file_index` are already stored. For the file at `file_index`, the first `batch_index`
+    batches are already stored; vector IDs are deterministic so a batch that was interrupted mid-upsert
+    is simply overwritten when it is run again.
+    """
+    job_id = job["id"]
+    namespace = job["namespace"] or None
+    files = job["files"]
+    start_file = job["file_index"]
+    start_batch = job["batch_index"]
+
+    for file_index in range(start_file, len(files)):
+        path = files[file_index]
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Uploaded file is missing: {path}")
+
+        logger.info(f"📁 Job {job_id}: processing file {file_index + 1}/{len(files)} ({os.path.basename(path)})")
+        ingestion_queue.update(job_id, current_file=os.path.basename(path))
+        # Pages are extracted and split lazily, so memory use does not grow with the size of the book
+        # A file that cannot be read fails the job rather than being recorded as ingested with no chunks
+        documents = iter_chunks(iter_documents([path], raise_errors=True))
+
+        def on_batch(batch_index: int, chunks: int, file_index: int = file_index):
+            ingestion_queue.checkpoint(job_id, file_index, batch_index + 1, chunks)
+
+        upsert_documents_in_batches(
+            documents,
+            namespace=namespace,
+            start_batch=start_batch if file_index == start_file else 0,
+            on_batch=on_batch
+        )
+        ingestion_queue.update(job_id, file_index=file_index + 1, batch_index=0, files_done=file_index + 1)
+
+    _remove_uploads(files)
+    # The namespace content changed, so its precomputed answers are stale
+    faq_store.schedule_warmup(job["namespace"])
+
+def process_faq_job(job: dict):
+    """Precompute the answers to the canonical questions of a namespace and replace the stored ones"""
+    # Imported here since it builds the LLM chain and vector store, which ingest-only workers do not need
+    from utils.full_chain import get_response
+    from utils.deadline import Deadline
+
+    job_id = job["id"]
+    namespace = job["namespace"]
+    questions = faq_store.get_questions(namespace)
+    embedding_model = get_embedding_model()
+    entries = []
+    for i, question in enumerate(questions):
+        result = get_response(question, [], decode_namespace(namespace), deadline=Deadline(FAQ_ANSWER_DEADLINE_SECONDS))
+        if result.get("degraded"):
+            # Only store full answers, the question is answered live until the next warm-up
+            logger.warning(f"⚠️ Job {job_id}: no full answer to '{question}' in time, skipping it")
+            continue
+        entries.append({
+            "question": question,
+            "answer": result["answer"],
+            "sources": [
+                {key: doc.metadata[key] for key in ("source", "page") if key in doc.metadata}
+                for doc in result.get("source_documents", [])
+            ],
+            "embedding": embedding_model.embed_query(question),
+        })
+        ingestion_queue.update(job_id, files_done=i + 1)
+    faq_store.replace_answers(namespace, entries)
+    logger.info(f"✅ Job {job_id}: precomputed {len(entries)} FAQ answers")
+
+JOB_HANDLERS = {
+    "ingest": process_ingest_job,
+    "faq_warm": process_faq_job,
+}
+
+def run_job(job_id: str):
+    """Run a single job, recording its outcome in the queue"""
+    job = ingestion_queue.get_job(job_id)
+    if job is None:
+        logger.warning(f"⚠️ Job {job_id} no longer exists, skipping")
+        ingestion_queue.discard(job_id)
+        return
+
+    ingestion_queue.start(job_id, WORKER_NAME)
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_keep_alive, args=(job_id, stop), daemon=True)
+    heartbeat.start()
+    try:
+        JOB_HANDLERS[job["kind"]](job)
+        ingestion_queue.complete(job_id)
+    except Exception as e:
+        logger.error(f"❌ Job {job_id} raised an error: {e}", exc_info=True)
+        # Uploaded files are kept until the job completes, so a failed job can be retried from the admin UI
+        ingestion_queue.fail(job_id, str(e))
+    finally:
+        stop.set()
+        heartbeat.join()
+
+def main():
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    logger.info(f"🚀 Ingestion worker {WORKER_NAME} started")
+    while True:
+        try:
+            ingestion_queue.requeue_stale()
+            job_id = ingestion_queue.dequeue(timeout=5)
+            if job_id is not None:
+                run_job(job_id)
+        except Exception as e:
+            logger.error(f"❌ Worker loop error: {e}", exc_info=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Rewrites chat histories stored as JSON into the binary format of `utils.chat_codec`, and reports the Redis memory
+and decode time before and after.
+
+Usage:
+    python src/migrate_chat_history.py [--dry-run] [--pattern "chat_history:*"]
+
+With --dry-run nothing is written and the "after" memory is estimated from the encoded sizes.
+"""
+import os
+import time
+import json
+import argparse
+import logging
+import redis
+from dotenv import load_dotenv
+from utils.chat_codec import encode_message, decode_message
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+
+def _decode_seconds(raw_messages) -> float:
+    """Time decoding a list of raw messages"""
+    start = time.perf_counter()
+    for raw_message in raw_messages:
+        decode_message(raw_message)
+    return time.perf_counter() - start
+
+def migrate_key(client: redis.Redis, key: bytes, dry_run: bool) -> dict:
+    """
+    Re-encode every message of one chat history list, keeping its TTL.
+
+    Returns:
+        dict: Memory and decode-time measurements for the key.
+    """
+    with client.pipeline() as pipe:
+        while True:
+            try:
+                # Retry if a message is appended to the session while it is being migrated
+                pipe.watch(key)
+                raw_messages = pipe.lrange(key, 0, -1)
+                memory_before = pipe.memory_usage(key, samples=0) or 0
+                ttl = pipe.pttl(key)
+
+                messages = [decode_message(raw_message) for raw_message in raw_messages]
+                encoded = [encode_message(msg.get("isBot", False), msg.get("content", ""), int(msg.get("timestamp", 0)))
+                           for msg in messages]
+                stats = {
+                    "messages": len(raw_messages),
+                    "legacy": sum(1 for raw_message in raw_messages if raw_message[:1] == b"{"),
+                    "payload_before": sum(len(raw_message) for raw_message in raw_messages),
+                    "payload_after": sum(len(message) for message in encoded),
+                    "memory_before": memory_before,
+                    "decode_before": _decode_seconds(raw_messages),
+                    "decode_after": _decode_seconds(encoded),
+                }
+
+                if dry_run or not stats["legacy"]:
+                    pipe.unwatch()
+                    stats["memory_after"] = memory_before - stats["payload_before"] + stats["payload_after"]
+                    return stats
+
+                pipe.multi()
+                pipe.delete(key)
+                pipe.rpush(key, *encoded)
+                if ttl and ttl > 0:
+                    pipe.pexpire(key, ttl)
+                pipe.execute()
+                stats["memory_after"] = client.memory_usage(key, samples=0) or 0
+                return stats
+            except redis.WatchError:
+                continue
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate chat histories from JSON to the binary message format")
+    parser.add_argument("--pattern", default="chat_history:*", help="Key pattern to migrate")
+    parser.add_argument("--dry-run", action="store_true", help="Only measure, do not rewrite anything")
+    args = parser.parse_args()
+
+    client = redis.Redis.from_url(REDIS_URL, decode_responses=False)
+    totals = {}
+    keys = 0
+    for key in client.scan_iter(match=args.pattern, count=500, _type="list"):
+        try:
+            stats = migrate_key(client, key, args.dry_run)
+        except ValueError as e:
+            logger.error(f"❌ Skipping {key!r}, it holds an unreadable message: {e}")
+            continue
+        keys += 1
+        for name, value in stats.items():
+            totals[name] = totals.get(name, 0) + value
+
+    if not keys:
+        logger.info("No chat histories found.")
+        return
+
+    mode = "Estimated" if args.dry_run else "Measured"
+    logger.info(f"✅ {'Checked' if args.dry_run else 'Migrated'} {keys} sessions, {totals['messages']} messages ({totals['legacy']} in JSON)")
+    logger.info(f"📦 Message payload: {totals['payload_before']} -> {totals['payload_after']} bytes")
+    logger.info(f"📦 {mode} Redis memory: {totals['memory_before']} -> {totals['memory_after']} bytes")
+    if totals["messages"]:
+        before_us = totals["decode_before"] / totals["messages"] * 1e6
+        after_us = totals["decode_after"] / totals["messages"] * 1e6
+        logger.info(f"⏱️ Decode time per message: {before_us:.2f} -> {after_us:.2f} µs")
+    print(json.dumps({"sessions": keys, **totals}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Exports a Pinecone namespace to a Parquet snapshot, or imports a snapshot into a namespace, reusing the stored
+vectors instead of re-embedding the original files.
+
+Usage:
+    python src/namespace_snapshot.py export --namespace <namespace> --file backup.parquet
+    python src/namespace_snapshot.py import --namespace <namespace> --file backup.parquet
+
+Namespaces are given as listed in the admin UI (the encoded Pinecone namespace), an empty string being the
+default namespace.
+"""
+import os
+import sys
+import argparse
+import logging
+from pinecone import Pinecone
+from utils.snapshot import (export_namespace, import_namespace, snapshot_dimension, PineconeTarget,
+                            SNAPSHOT_BATCH_SIZE, SNAPSHOT_CONCURRENCY)
+from utils.Vector_db import create_index
+from utils.faq import faq_store
+from utils.retrieval_cache import bump_namespace_version
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import a namespace snapshot")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("--namespace", default="", help="Pinecone namespace (empty for the default namespace)")
+    parser.add_argument("--file", required=True, help="Parquet snapshot file")
+    parser.add_argument("--index", default="non-profit-rag", help="Pinecone index name")
+    parser.add_argument("--batch-size", type=int, default=SNAPSHOT_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=SNAPSHOT_CONCURRENCY)
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_namespace(args.file, namespace=args.namespace, index_name=args.index,
+                         batch_size=args.batch_size, concurrency=args.concurrency)
+    else:
+        dimension = snapshot_dimension(args.file)
+        create_index(index_name=args.index, vect_length=dimension)
+        index_dimension = Pinecone(api_key=os.getenv('PINECONE_API_KEY', "")).describe_index(args.index).dimension
+        if index_dimension != dimension:
+            logger.error(f"❌ The snapshot holds {dimension}-dimensional vectors but index '{args.index}' "
+                         f"expects {index_dimension}, not importing")
+            sys.exit(1)
+        import_namespace(args.file, PineconeTarget(index_name=args.index, namespace=args.namespace),
+                         batch_size=args.batch_size, concurrency=args.concurrency)
+        # The namespace content changed, so its cached retrievals and precomputed answers are stale
+        bump_namespace_version(args.namespace)
+        faq_store.schedule_warmup(args.namespace)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Measures the ingestion write path against a local HTTP stand-in of a Pinecone index, which records every upsert
+request (timing, size, vector count) and can simulate latency and transient failures. No Pinecone account or
+embedding model is needed: random vectors are upserted.
+
+Usage:
+    python src/upsert_benchmark.py --vectors 5000 --batch-size 64 --concurrency 4 --latency 0.2 --fail-rate 0.05
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("PINECONE_API_KEY", "local")
+from utils.pinecone_upsert import PineconeWriter, upsert_concurrently, UPSERT_CONCURRENCY
+
+class RecordingIndex(ThreadingHTTPServer):
+    """Stand-in of a Pinecone index data plane, accepting upserts and recording them"""
+    daemon_threads = True
+
+    def __init__(self, latency: float, fail_rate: float):
+        super().__init__(("127.0.0.1", 0), UpsertHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.requests = []
+        self.lock = threading.Lock()
+
+class UpsertHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        start = time.perf_counter()
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.server.latency)
+        failed = random.random() < self.server.fail_rate
+        count = len(json.loads(body).get("vectors", []))
+        with self.server.lock:
+            self.server.requests.append({"path": self.path, "start": start, "end": time.perf_counter(),
+                                         "bytes": len(body), "vectors": count, "failed": failed})
+        status, payload = (503, {"message": "unavailable"}) if failed else (200, {"upsertedCount": count})
+        response = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+def max_overlap(requests) -> int:
+    """The highest number of requests the stand-in was serving at once"""
+    events = sorted([(r["start"], 1) for r in requests] + [(r["end"], -1) for r in requests])
+    current = peak = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark concurrent upserts against a local index stand-in")
+    parser.add_argument("--vectors", type=int, default=5000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=UPSERT_CONCURRENCY)
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated round-trip per request (seconds)")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with a 503")
+    args = parser.parse_args()
+
+    server = RecordingIndex(args.latency, args.fail_rate)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    writer = PineconeWriter(host=f"http://127.0.0.1:{server.server_address[1]}", transport="rest", namespace="benchmark")
+
+    def batches():
+        for first in range(0, args.vectors, args.batch_size):
+            yield [
+                writer.to_record(f"vec-{i}", [random.gauss(0, 0.05) for _ in range(args.dimension)], "text", {"source": "benchmark"})
+                for i in range(first, min(first + args.batch_size, args.vectors))
+            ]
+
+    start = time.perf_counter()
+    upserted = upsert_concurrently(writer, batches(), concurrency=args.concurrency)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    requests = server.requests
+    succeeded = [r for r in requests if not r["failed"]]
+    stored = sum(r["vectors"] for r in succeeded)
+    print(f"Upserted {upserted} vectors in {elapsed:.2f}s ({upserted / elapsed:.0f} vectors/s)")
+    print(f"Requests: {len(requests)} ({len(requests) - len(succeeded)} failed and retried), paths: {sorted({r['path'] for r in requests})}")
+    print(f"Peak concurrent requests: {max_overlap(requests)} (limit {args.concurrency})")
+    print(f"Vectors received: {stored}, request bytes per vector: {sum(r['bytes'] for r in succeeded) / max(stored, 1):.0f}")
+    sys.exit(0 if stored == args.vectors == upserted else 1)
+
+if __name__ == "__main__":
+    main()
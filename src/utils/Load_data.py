@@ -1,10 +1,13 @@
 import os
+import re
 import logging
-from typing import List
+from functools import lru_cache
+from itertools import groupby
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 from dotenv import load_dotenv
 from langchain.schema import Document
 from langchain_community.document_loaders import WebBaseLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain.text_splitter import RecursiveCharacterTextSplitter, TextSplitter
 from langchain_community.document_loaders import (TextLoader, PyPDFLoader, Docx2txtLoader)
 import logging
 
@@ -17,6 +20,108 @@ _ = load_dotenv(override=True)
 logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
 logger = logging.getLogger(__name__)
 
+# Chunks are sized in tokens of the embedding model, which truncates its input at EMBEDDING_MAX_TOKENS
+EMBEDDING_MODEL_NAME = "intfloat/multilingual-e5-small"
+EMBEDDING_MAX_TOKENS = 512
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", 480))  # Leaves room for the special tokens and joining differences
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 64))
+
+# Sentence ends in Arabic and Latin text
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?؟۔…])\s+|\n+")
+
+@lru_cache(maxsize=1)
+def get_tokenizer():
+    """
+    Returns the fast tokenizer of the embedding model, loading it once per process.
+
+    Returns:
+        PreTrainedTokenizerFast: The multilingual-e5-small tokenizer.
+    """
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(EMBEDDING_MODEL_NAME, use_fast=True)
+
+class TokenAwareTextSplitter(TextSplitter):
+    """
+    Splits text into sentences and packs them into chunks of at most `chunk_size` tokens of the embedding model,
+    repeating up to `chunk_overlap` tokens of trailing sentences at the start of the next chunk.
+
+    All sentences of a text are tokenized in one batched call. Sentences longer than a whole chunk are cut at
+    token boundaries using the tokenizer's offsets.
+    """
+    def __init__(self, chunk_size: int = CHUNK_TOKENS, chunk_overlap: int = CHUNK_OVERLAP_TOKENS, tokenizer: Any = None, **kwargs: Any):
+        # Oversized sentences are cut in windows advancing by chunk_size - chunk_overlap tokens, which must be positive
+        if chunk_overlap >= chunk_size:
+            raise ValueError(f"Chunk overlap ({chunk_overlap}) must be smaller than chunk size ({chunk_size})")
+        super().__init__(chunk_size=chunk_size, chunk_overlap=chunk_overlap, **kwargs)
+        self._tokenizer = tokenizer or get_tokenizer()
+
+    def _pieces(self, text: str) -> List[Tuple[str, int]]:
+        """Sentences of the text with their token counts, long sentences being cut to fit a chunk"""
+        sentences = [sentence.strip() for sentence in SENTENCE_BOUNDARY.split(text) if sentence and sentence.strip()]
+        if not sentences:
+            return []
+        encodings = self._tokenizer(sentences, add_special_tokens=False, return_offsets_mapping=True)
+
+        pieces = []
+        step = self._chunk_size - self._chunk_overlap
+        for sentence, offsets in zip(sentences, encodings["offset_mapping"]):
+            if len(offsets) <= self._chunk_size:
+                pieces.append((sentence, len(offsets)))
+                continue
+            for start in range(0, len(offsets), step):
+                window = offsets[start:start + self._chunk_size]
+                pieces.append((sentence[window[0][0]:window[-1][1]], len(window)))
+                if start + self._chunk_size >= len(offsets):
+                    break
+        return pieces
+
+    def split_text(self, text: str) -> List[str]:
+        chunks = []
+        current: List[Tuple[str, int]] = []
+        current_tokens = 0
+        for piece, tokens in self._pieces(text):
+            if current and current_tokens + tokens > self._chunk_size:
+                chunks.append(" ".join(sentence for sentence, _ in current))
+                # Carry the trailing sentences that fit in the overlap over to the next chunk
+                overlap: List[Tuple[str, int]] = []
+                overlap_tokens = 0
+                for sentence, sentence_tokens in reversed(current):
+                    if overlap_tokens + sentence_tokens > self._chunk_overlap:
+                        break
+                    overlap.insert(0, (sentence, sentence_tokens))
+                    overlap_tokens += sentence_tokens
+                if overlap_tokens + tokens > self._chunk_size:
+                    overlap, overlap_tokens = [], 0
+                current, current_tokens = overlap, overlap_tokens
+            current.append((piece, tokens))
+            current_tokens += tokens
+        if current:
+            chunks.append(" ".join(sentence for sentence, _ in current))
+        return chunks
+
+def count_truncated(chunks: List[Document], max_tokens: int = EMBEDDING_MAX_TOKENS, batch_size: int = 256) -> Dict[str, int]:
+    """
+    Counts the chunks that the embedding model would truncate, and the tokens it would drop.
+
+    Args:
+        chunks (List[Document]): The chunks to check.
+        max_tokens (int): The input length of the embedding model, special tokens included. Defaults to EMBEDDING_MAX_TOKENS.
+        batch_size (int): The number of chunks tokenized per call. Defaults to 256.
+
+    Returns:
+        Dict[str, int]: The number of chunks, truncated chunks, total tokens and dropped tokens.
+    """
+    tokenizer = get_tokenizer()
+    report = {"chunks": len(chunks), "truncated": 0, "tokens": 0, "dropped_tokens": 0}
+    for i in range(0, len(chunks), batch_size):
+        texts = [chunk.page_content for chunk in chunks[i:i + batch_size]]
+        for ids in tokenizer(texts, add_special_tokens=True)["input_ids"]:
+            report["tokens"] += len(ids)
+            if len(ids) > max_tokens:
+                report["truncated"] += 1
+                report["dropped_tokens"] += len(ids) - max_tokens
+    return report
+
 def splitting_documents(documents: list[Document], chunk_size: int = 1500, chunk_overlap: int = 300) -> list[Document]:
     """
     Splits a list of documents into smaller sub-documents based on a specified character chunk size.
@@ -51,45 +156,83 @@ def loading_url(url: str=None) -> list[Document]:
         logger.error(f"❌ Error loading document from URL {url}: {e}", exc_info=True)
         return []
     
-def loading_documents(file_paths: List[str]) -> list[Document]:    
+def iter_documents(file_paths: List[str], raise_errors: bool = False) -> Iterator[Document]:
     """
-    Loads a collection of documents from a list of file paths and returns them as a list of Document objects.
+    Lazily loads documents from a list of file paths. PDFs are read page by page, so only one page is held
+    in memory at a time.
 
     Args:
         file_paths (List[str]): A list of file paths to load.
+        raise_errors (bool): Raise loading errors and unsupported formats instead of logging and skipping the file.
+            Errors after the first page of a file are always raised. Defaults to False.
 
-    Returns:
-        list[Document]: A list of Document objects representing the loaded documents.
+    Yields:
+        Document: One document per PDF page, or per .txt/.docx file. PDF pages carry their 1-based `page` number in metadata.
 
     Supported file formats are .txt, .pdf, .docx
     """
-    full_document = []
     for path in file_paths:
         filename = os.path.basename(path)
         logger.info(f"📁 Processing file: {filename}")
+        yielded = False
         try:
             if path.endswith(".txt"):
                 loader = TextLoader(path, encoding="utf-8")
             elif path.endswith(".pdf"):
-                loader = PyPDFLoader(path, mode="single")
+                loader = PyPDFLoader(path, mode="page")
             elif path.endswith(".docx"):
                 loader = Docx2txtLoader(path)
             else:
+                if raise_errors:
+                    raise ValueError(f"Unsupported file format: {path}")
                 logger.warning(f"✖️ Unsupported file format: {path}")
                 continue
             
-            documents = loader.load()
-            documents = [doc.page_content.replace("\n", " ") for doc in documents if doc.page_content.strip()]
-            
-            full_document.extend(
-                Document(page_content=doc, metadata={"source": filename}) for doc in documents
-                )
+            for doc in loader.lazy_load():
+                if not doc.page_content.strip():
+                    continue
+                metadata = {"source": filename}
+                if path.endswith(".pdf"):
+                    metadata["page"] = doc.metadata.get("page", 0) + 1
+                yielded = True
+                yield Document(page_content=doc.page_content.replace("\n", " "), metadata=metadata)
         
         except Exception as e:
+            # Once pages of a file were produced, skipping the rest would silently store it partially
+            if raise_errors or yielded:
+                raise
             logger.error(f"❌ Error processing file {path}: {e}", exc_info=True)
             continue
-    
-    return full_document
+
+def loading_documents(file_paths: List[str]) -> list[Document]:    
+    """
+    Loads a collection of documents from a list of file paths and returns them as a list of Document objects.
+
+    Args:
+        file_paths (List[str]): A list of file paths to load.
+
+    Returns:
+        list[Document]: A list of Document objects representing the loaded documents.
+
+    Supported file formats are .txt, .pdf, .docx
+    """
+    return list(iter_documents(file_paths))
+
+def iter_chunks(documents: Iterable[Document], text_splitter: TextSplitter = None) -> Iterator[Document]:
+    """
+    Splits documents one at a time as they are produced, so a large book never has to be loaded as a whole.
+
+    Args:
+        documents (Iterable[Document]): The documents to split, e.g. from `iter_documents`.
+        text_splitter (TextSplitter, optional): The splitter to use. Defaults to a TokenAwareTextSplitter
+            sized for the embedding model (CHUNK_TOKENS/CHUNK_OVERLAP_TOKENS).
+
+    Yields:
+        Document: The sub-documents, with the metadata of the document they come from.
+    """
+    text_splitter = text_splitter or TokenAwareTextSplitter()
+    for document in documents:
+        yield from text_splitter.split_documents([document])
 
 def loading_data(file_paths: List[str]=None, url: str=None) -> list[Document]:
     """
@@ -107,7 +250,32 @@ def loading_data(file_paths: List[str]=None, url: str=None) -> list[Document]:
     if url:
         full_doc.extend(loading_url(url))
     if file_paths is not None and len(file_paths) > 0:
-        splitting_doc = splitting_documents(loading_documents(file_paths))
+        splitting_doc = list(iter_chunks(iter_documents(file_paths)))
         logger.info(f"✅ Length of splitting_doc: {len(splitting_doc)}")
         full_doc.extend(splitting_doc)
-    return full_doc
\ No newline at end of file
+    return full_doc
+
+def chunking_report(file_paths: List[str], chunk_size: int = 1500, chunk_overlap: int = 300) -> Dict[str, Dict[str, int]]:
+    """
+    Compares the character-based splitting used before token-aware chunking with the token-aware splitting
+    of the given files, counting the chunks that the embedding model truncates with each.
+
+    Args:
+        file_paths (List[str]): The files to check.
+        chunk_size (int): The character chunk size of the previous splitting. Defaults to 1500.
+        chunk_overlap (int): The character chunk overlap of the previous splitting. Defaults to 300.
+
+    Returns:
+        Dict[str, Dict[str, int]]: The `count_truncated` report of each splitting, under "before" and "after".
+    """
+    documents = loading_documents(file_paths)
+    # The previous loading read each file as a single document (PyPDFLoader mode="single", pages joined by "\n\f"
+    # before newlines were replaced), so rebuild those rather than splitting the per-page documents
+    whole_files = [
+        Document(page_content=" \f".join(doc.page_content for doc in pages), metadata={"source": source})
+        for source, pages in groupby(documents, key=lambda doc: doc.metadata["source"])
+    ]
+    return {
+        "before": count_truncated(splitting_documents(whole_files, chunk_size=chunk_size, chunk_overlap=chunk_overlap)),
+        "after": count_truncated(list(iter_chunks(documents))),
+    }
@@ -1,14 +1,20 @@
 import os
 import logging
 import asyncio
-from typing import List
+import base64
+import hashlib
+from functools import lru_cache
+from itertools import islice
+from typing import Callable, Iterable, List, Optional
 from dotenv import load_dotenv
 from langchain.schema import Document
 from pinecone import Pinecone, ServerlessSpec
-from langchain_pinecone import PineconeVectorStore
 # from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_huggingface import HuggingFaceEmbeddings
 from .exceptions import IndexNotFound
+from .embedding_cache import CachedEmbeddings, EmbeddingCache, EMBEDDING_CACHE_DIR
+from .retrieval_cache import bump_namespace_version
+from .pinecone_upsert import PineconeWriter, upsert_concurrently, UPSERT_CONCURRENCY, PINECONE_INDEX_HOST
 
 # Load environment variables
 _ = load_dotenv(override=True)
@@ -17,6 +23,32 @@ _ = load_dotenv(override=True)
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 logger = logging.getLogger(__name__)
 
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", 64))
+
+def encode_namespace(name: str) -> str:
+    """
+    Converts a namespace display name to the Pinecone namespace it is stored under.
+
+    Args:
+        name (str): The namespace name, e.g. "Annual Reports 2024".
+
+    Returns:
+        str: The URL-safe base64 encoding of the lower-cased, dash-separated name (Pinecone namespaces must be ASCII).
+    """
+    return base64.urlsafe_b64encode(name.replace(" ", "-").lower().encode("utf-8")).decode("ascii")
+
+def decode_namespace(namespace: str) -> str:
+    """
+    Converts a Pinecone namespace back to the name it was encoded from by `encode_namespace`.
+
+    Args:
+        namespace (str): The Pinecone namespace.
+
+    Returns:
+        str: The lower-cased, dash-separated namespace name.
+    """
+    return base64.urlsafe_b64decode(namespace).decode("utf-8")
+
 def create_index(index_name: str='non-profit-rag', vect_length: int = 384):
     """
     Creates a Pinecone index with the specified name and vector length.
@@ -93,6 +125,113 @@ def get_existing_namespaces(index_name: str = 'non-profit-rag') -> List[str]:
         logger.error(f"Error getting namespaces: {e}")
         return []
 
+@lru_cache(maxsize=1)
+def get_embedding_model() -> HuggingFaceEmbeddings:
+    """
+    Returns the passage embedding model, loading it once per process.
+
+    Returns:
+        HuggingFaceEmbeddings: The multilingual-e5-small embedding model.
+    """
+    # Ensure an event loop exists in Streamlit's ScriptRunner thread
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.set_event_loop(asyncio.new_event_loop())
+
+    return HuggingFaceEmbeddings(
+        model_name="intfloat/multilingual-e5-small",
+        model_kwargs={'device': 'cpu'},
+        encode_kwargs={'normalize_embeddings': True}
+    )
+
+@lru_cache(maxsize=1)
+def get_passage_embeddings(vect_length: int=384):
+    """
+    Returns the embeddings used when adding documents: the embedding model behind the on-disk embedding cache,
+    so re-ingesting a chunk that was already embedded skips the model. Set EMBEDDING_CACHE_DIR to an empty
+    string to disable the cache.
+
+    Args:
+        vect_length (int): The length of the vectors produced by the model. Defaults to 384.
+
+    Returns:
+        Embeddings: The (cached) embedding model.
+    """
+    embedding_model = get_embedding_model()
+    if not EMBEDDING_CACHE_DIR:
+        return embedding_model
+    cache = EmbeddingCache(model_name=embedding_model.model_name, dimension=vect_length)
+    logger.info(f"🗃️ Embedding cache loaded with {len(cache)} entries")
+    return CachedEmbeddings(embedding_model, cache)
+
+def document_id(document: Document, position: int) -> str:
+    """
+    Returns a deterministic vector ID for a chunk, so re-running a batch overwrites its vectors instead of duplicating them.
+
+    Args:
+        document (Document): The chunk.
+        position (int): The position of the chunk within its source file.
+
+    Returns:
+        str: The vector ID.
+    """
+    source = document.metadata.get("source", "")
+    return hashlib.sha1(f"{source}:{position}:{document.page_content}".encode("utf-8")).hexdigest()
+
+def upsert_documents_in_batches(documents: Iterable[Document], namespace: str = None, index_name: str='non-profit-rag',
+                                vect_length: int=384, batch_size: int=UPSERT_BATCH_SIZE, start_batch: int=0,
+                                on_batch: Optional[Callable[[int, int], None]]=None,
+                                concurrency: int=UPSERT_CONCURRENCY) -> int:
+    """
+    Embeds and upserts documents into a Pinecone namespace batch by batch, embedding the next batches while up to
+    `concurrency` upserts are in flight. Unlike `add_documents_to_pinecone`, errors are raised to the caller so that
+    a job can be checkpointed and retried.
+
+    Args:
+        documents (Iterable[Document]): The chunks to add, in a stable order.
+        namespace (str, optional): The namespace to add documents to. Defaults to None.
+        index_name (str): The name of the index. Defaults to 'non-profit-rag'.
+        vect_length (int): The length of the vectors in the index. Defaults to 384.
+        batch_size (int): The number of chunks per upsert. Defaults to UPSERT_BATCH_SIZE.
+        start_batch (int): The number of leading batches that are already stored and should be skipped. Defaults to 0.
+        on_batch (Callable[[int, int], None], optional): Called with (batch_index, chunks_in_batch) in batch order,
+            once the batch and every batch before it are stored.
+        concurrency (int): The maximum number of concurrent upserts. Defaults to UPSERT_CONCURRENCY.
+
+    Returns:
+        int: The number of chunks upserted by this call.
+    """
+    if not PINECONE_INDEX_HOST:
+        create_index(index_name=index_name, vect_length=vect_length)
+    embeddings = get_passage_embeddings(vect_length)
+    writer = PineconeWriter(index_name=index_name, namespace=namespace)
+    submitted = False
+
+    def record_batches():
+        nonlocal submitted
+        iterator = iter(documents)
+        position = 0
+        batch_index = 0
+        while batch := list(islice(iterator, batch_size)):
+            if batch_index >= start_batch:
+                vectors = embeddings.embed_documents([doc.page_content for doc in batch])
+                submitted = True
+                yield [
+                    writer.to_record(document_id(doc, position + offset), vector, doc.page_content, doc.metadata)
+                    for offset, (doc, vector) in enumerate(zip(batch, vectors))
+                ]
+            position += len(batch)
+            batch_index += 1
+
+    try:
+        return upsert_concurrently(writer, record_batches(), concurrency=concurrency, on_batch=on_batch,
+                                   first_batch=start_batch)
+    finally:
+        if submitted:
+            # Cached retrieval results for this namespace are now stale, even if a later batch failed
+            bump_namespace_version(namespace)
+
 def add_documents_to_pinecone(index_name: str='non-profit-rag', vect_length: int=384, 
                               documents: List[Document]=None, namespace: str = None):
     """
@@ -111,45 +250,15 @@ def add_documents_to_pinecone(index_name: str='non-profit-rag', vect_length: int
         if not documents:
             logger.warning("⚠️ No valid documents found for processing.")
             return
-        
-        # Ensure an event loop exists in Streamlit's ScriptRunner thread
-        try:
-            asyncio.get_running_loop()
-        except RuntimeError:
-            asyncio.set_event_loop(asyncio.new_event_loop())
-
-        embedding_model = HuggingFaceEmbeddings(
-        model_name="intfloat/multilingual-e5-small",
-        model_kwargs={'device': 'cpu'},
-        encode_kwargs={'normalize_embeddings': True}
-        )
-        pinecone = Pinecone(api_key=os.getenv('PINECONE_API_KEY', ""))
-        
-        if index_name not in [index_info["name"] for index_info in pinecone.list_indexes()]:
-            logger.warning(f"⚠️ Index '{index_name}' does not exist. Create the index first.")
-            
-            create_index(index_name=index_name, vect_length=vect_length)
-            logger.info("✅ Successfully created the index in Pinecone.")
             
         # Check if namespace exists (just for logging)
         namespace_exists = ensure_namespace_exists(index_name, namespace) if namespace else False
         if namespace and not namespace_exists:
             logger.info(f'🆕 Will create namespace: {namespace} when adding documents')
         
-        vector_store_kwargs = {
-            "index_name": index_name,
-            "embedding": embedding_model,
-            "pinecone_api_key": os.getenv('PINECONE_API_KEY', "")
-        }
-
-        if namespace:
-            vector_store_kwargs["namespace"] = namespace
-        
-        vector_store = PineconeVectorStore(**vector_store_kwargs)
-        
         # Only add documents if we have actual content (not empty)
         if documents and len(documents) > 0 and documents[0].page_content.strip():
-            vector_store.add_documents(documents=documents)
+            upsert_documents_in_batches(documents, namespace=namespace, index_name=index_name, vect_length=vect_length)
             action = "created and added to" if namespace and not namespace_exists else "added to"
             logger.info(f"✅ Successfully {action} namespace: {namespace}")
         
@@ -182,6 +291,7 @@ def delete_vectors_by_source(source_name: str, namespace='__default__'):
             batch_to_delete = matching_ids[i : i + delete_batch_size]
             index.delete(ids=batch_to_delete, namespace=namespace)
             logger.info(f"[INFO] Deleted {len(batch_to_delete)} vectors...")
+        bump_namespace_version(namespace)
         logger.info("[SUCCESS] Deletion complete.")
     else:
         logger.info("No vectors found with that source.")
\ No newline at end of file
@@ -0,0 +1,95 @@
+import os
+import json
+import struct
+import logging
+from typing import Any, Dict, Union
+from dotenv import load_dotenv
+
+try:
+    import zstandard
+except ImportError:  # Compression is optional, messages are then stored uncompressed
+    zstandard = None
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Messages whose UTF-8 content is at least this many bytes are zstd-compressed
+CHAT_COMPRESS_THRESHOLD = int(os.getenv("CHAT_COMPRESS_THRESHOLD", 512))
+CHAT_COMPRESS_LEVEL = int(os.getenv("CHAT_COMPRESS_LEVEL", 3))
+
+# Binary messages start with a version byte, which can never be the "{" that starts a legacy JSON message
+FORMAT_VERSION = 1
+FLAG_AI = 0x01
+FLAG_ZSTD = 0x02
+# version, flags, timestamp
+HEADER = struct.Struct("<BBI")
+
+_compressor = zstandard.ZstdCompressor(level=CHAT_COMPRESS_LEVEL) if zstandard else None
+_decompressor = zstandard.ZstdDecompressor() if zstandard else None
+
+def is_ai(isBot: Union[str, bool]) -> bool:
+    """Normalize the `isBot` values used by the chat history ("ai"/"human" or a boolean)"""
+    return isBot is True or isBot == "ai"
+
+def encode_message(isBot: Union[str, bool], content: str, timestamp: int) -> bytes:
+    """
+    Encode a chat message as a compact binary record.
+
+    Layout: version (1 byte), flags (1 byte: AI author, zstd-compressed content), timestamp (uint32),
+    followed by the UTF-8 content, zstd-compressed when it is longer than CHAT_COMPRESS_THRESHOLD.
+
+    Args:
+        isBot (str | bool): "ai"/True for assistant messages, "human"/False for user messages.
+        content (str): The message text.
+        timestamp (int): Unix timestamp of the message.
+
+    Returns:
+        bytes: The encoded message.
+    """
+    flags = FLAG_AI if is_ai(isBot) else 0
+    payload = content.encode("utf-8")
+    if _compressor is not None and len(payload) >= CHAT_COMPRESS_THRESHOLD:
+        compressed = _compressor.compress(payload)
+        if len(compressed) < len(payload):
+            payload = compressed
+            flags |= FLAG_ZSTD
+    return HEADER.pack(FORMAT_VERSION, flags, timestamp) + payload
+
+def decode_message(data: Union[bytes, str]) -> Dict[str, Any]:
+    """
+    Decode a chat message stored by `encode_message`, or a legacy JSON message.
+
+    Args:
+        data (bytes | str): The raw Redis list element.
+
+    Returns:
+        Dict[str, Any]: The message as {"isBot", "content", "timestamp"}.
+
+    Raises:
+        ValueError: If the element is neither a valid binary nor a valid JSON message.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    if data[:1] == b"{":
+        return json.loads(data)
+    if len(data) < HEADER.size:
+        raise ValueError("Truncated chat message")
+
+    version, flags, timestamp = HEADER.unpack_from(data)
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unknown chat message format version: {version}")
+    payload = data[HEADER.size:]
+    if flags & FLAG_ZSTD:
+        if _decompressor is None:
+            raise ValueError("Chat message is zstd-compressed but zstandard is not installed")
+        try:
+            payload = _decompressor.decompress(payload)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"Corrupted compressed chat message: {e}") from e
+    return {
+        "isBot": "ai" if flags & FLAG_AI else "human",
+        "content": payload.decode("utf-8"),
+        "timestamp": timestamp
+    }
@@ -0,0 +1,140 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Optional, Tuple
+from dotenv import load_dotenv
+from .exceptions import DeadlineExceeded
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Percentile of the observed first-token latencies after which a duplicate LLM request is sent
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 95))
+# Hedge delay used until enough latencies were observed, and bounds of the computed delay (seconds)
+HEDGE_INITIAL_DELAY = float(os.getenv("HEDGE_INITIAL_DELAY", 4))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", 0.5))
+HEDGE_MAX_DELAY = float(os.getenv("HEDGE_MAX_DELAY", 10))
+HEDGE_MIN_SAMPLES = 20
+
+class Deadline:
+    """Point in time by which a request must be answered, shared by every step of the request"""
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline, never negative"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    async def run(self, awaitable: Awaitable) -> Any:
+        """Await a step, raising DeadlineExceeded if it does not finish before the deadline"""
+        try:
+            return await asyncio.wait_for(awaitable, timeout=self.remaining())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("Deadline expired before the step finished")
+
+class LatencyTracker:
+    """Rolling window of first-token latencies, giving the hedge delay"""
+    def __init__(self, window: int = 200, percentile: float = HEDGE_PERCENTILE):
+        self.samples = deque(maxlen=window)
+        self.percentile = percentile
+
+    def record(self, latency: float):
+        self.samples.append(latency)
+
+    def hedge_delay(self) -> float:
+        if len(self.samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_INITIAL_DELAY
+        ordered = sorted(self.samples)
+        rank = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return min(HEDGE_MAX_DELAY, max(HEDGE_MIN_DELAY, ordered[rank]))
+
+async def _first_chunk(llm, prompt: str) -> Tuple[Any, AsyncIterator, float]:
+    """Start streaming an answer, returning once its first chunk arrived, with the time it arrived at"""
+    stream = llm.astream(prompt)
+    try:
+        chunk = await stream.__anext__()
+    except BaseException:
+        await stream.aclose()
+        raise
+    return chunk, stream, time.monotonic()
+
+async def _discard(task: asyncio.Task):
+    """Cancel a losing request, closing its stream if it already started answering"""
+    if not task.done():
+        task.cancel()
+    try:
+        _, stream, _ = await task
+        await stream.aclose()
+    except BaseException:
+        pass
+
+async def hedged_completion(llm, prompt: str, deadline: Deadline, tracker: LatencyTracker) -> str:
+    """
+    Get the completion of a prompt, sending a duplicate request if the first chunk takes longer than the hedge
+    delay. The first request to start answering wins and the other one is cancelled.
+
+    Args:
+        llm: The LangChain chat model.
+        prompt (str): The prompt.
+        deadline (Deadline): The request deadline.
+        tracker (LatencyTracker): The first-token latencies, updated with the time from the first request to the
+            first token, whichever request produced it.
+
+    Returns:
+        str: The completion.
+
+    Raises:
+        DeadlineExceeded: If the completion did not finish before the deadline.
+    """
+    started = time.monotonic()
+    pending = {asyncio.create_task(_first_chunk(llm, prompt))}
+    hedged = False
+    winner: Optional[asyncio.Task] = None
+    error: Optional[BaseException] = None
+    try:
+        while winner is None:
+            timeout = deadline.remaining() if hedged else min(tracker.hedge_delay(), deadline.remaining())
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None and winner is None:
+                    winner = task
+                elif task.exception() is not None:
+                    error = task.exception()
+                else:
+                    await _discard(task)
+            if winner is not None:
+                break
+            if deadline.expired():
+                raise DeadlineExceeded("Deadline expired before the first token")
+            if not hedged:
+                # The primary request is slow (or failed), race it with a duplicate
+                logger.info(f"[HEDGE] No first token after {timeout:.2f}s, sending a duplicate request")
+                pending.add(asyncio.create_task(_first_chunk(llm, prompt)))
+                hedged = True
+            elif not pending:
+                raise error
+    finally:
+        for task in pending:
+            await _discard(task)
+
+    chunk, stream, arrived_at = winner.result()
+    # Measured from the first request, so a slow primary beaten by its hedge still raises the percentile
+    tracker.record(arrived_at - started)
+    parts = [chunk.content]
+
+    async def drain():
+        async for chunk in stream:
+            parts.append(chunk.content)
+
+    try:
+        await deadline.run(drain())
+    finally:
+        await stream.aclose()
+    return "".join(parts)
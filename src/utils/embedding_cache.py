@@ -0,0 +1,195 @@
+import os
+import re
+import fcntl
+import struct
+import hashlib
+import logging
+import numpy as np
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+_ = load_dotenv(override=True)
+
+# Cache configuration, set EMBEDDING_CACHE_DIR to an empty string to disable the cache
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", ".cache/embeddings")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 500_000))
+
+KEY_SIZE = 16
+# Index records are a 16-byte key digest followed by the little-endian row of its vector in the vectors file
+INDEX_RECORD = struct.Struct(f"<{KEY_SIZE}sI")
+# Rows copied at a time when compacting (8192 x 384 float32 is about 12 MiB)
+COMPACT_SLICE_ROWS = 8192
+
+class EmbeddingCache:
+    """
+    Persistent cache of chunk embeddings keyed by (model name, chunk text hash).
+
+    Vectors are appended to a float32 file that is read through a memory map, and an append-only index file
+    maps each key digest to its row. Both files live in a directory per model and are shared by every process
+    using the same directory: writes happen under an exclusive file lock, and other processes pick up appended
+    records the next time they miss. When the cache holds more than `max_entries` vectors it is compacted,
+    keeping the most recently used three quarters.
+    """
+    def __init__(self, model_name: str, dimension: int, cache_dir: str = EMBEDDING_CACHE_DIR,
+                 max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.model_name = model_name
+        self.dimension = dimension
+        self._row_bytes = dimension * 4
+        self.max_entries = max_entries
+        self.directory = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        os.makedirs(self.directory, exist_ok=True)
+        self.vectors_path = os.path.join(self.directory, "vectors.f32")
+        self.index_path = os.path.join(self.directory, "index.bin")
+        self.lock_path = os.path.join(self.directory, ".lock")
+
+        self._index: Dict[bytes, int] = {}
+        self._last_used: Dict[bytes, int] = {}
+        self._clock = 0
+        self._index_inode: Optional[int] = None
+        self._index_offset = 0
+        self._vectors: Optional[np.memmap] = None
+        with self._locked(fcntl.LOCK_SH):
+            self._refresh()
+
+    def _key(self, text: str) -> bytes:
+        """Hash a chunk text together with the model name"""
+        return hashlib.blake2b(f"{self.model_name}\0{text}".encode("utf-8"), digest_size=KEY_SIZE).digest()
+
+    @contextmanager
+    def _locked(self, mode: int):
+        """Hold the cache directory lock"""
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Read index records appended since the last refresh, or reload everything if the cache was compacted"""
+        try:
+            inode = os.stat(self.index_path).st_ino
+        except FileNotFoundError:
+            self._index, self._index_inode, self._index_offset, self._vectors = {}, None, 0, None
+            return
+
+        if inode != self._index_inode:
+            self._index, self._index_inode, self._index_offset, self._vectors = {}, inode, 0, None
+
+        with open(self.index_path, "rb") as index_file:
+            index_file.seek(self._index_offset)
+            data = index_file.read()
+        # Ignore a trailing partial record left by an interrupted write
+        usable = len(data) - len(data) % INDEX_RECORD.size
+        for key, row in INDEX_RECORD.iter_unpack(data[:usable]):
+            self._index[key] = row
+        self._index_offset += usable
+
+        # Remap the vectors file in the same locked section as the index, so both always describe the same files
+        size = os.path.getsize(self.vectors_path) if os.path.exists(self.vectors_path) else 0
+        if size % self._row_bytes:
+            # A trailing partial row left by an interrupted write, no index record points at it
+            logger.warning(f"⚠️ Embedding cache {self.vectors_path} ends with a partial row, ignoring it")
+        rows = size // self._row_bytes
+        if rows and (self._vectors is None or self._vectors.shape[0] < rows):
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dimension))
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Look up the cached vectors of several texts, returning None for misses"""
+        keys = [self._key(text) for text in texts]
+        if any(key not in self._index for key in keys):
+            with self._locked(fcntl.LOCK_SH):
+                self._refresh()
+
+        vectors = self._vectors
+        results = []
+        for key in keys:
+            row = self._index.get(key)
+            if row is None or vectors is None or row >= vectors.shape[0]:
+                results.append(None)
+                continue
+            self._clock += 1
+            self._last_used[key] = self._clock
+            results.append(vectors[row].tolist())
+        return results
+
+    def put_many(self, texts: List[str], vectors: List[List[float]]):
+        """Append vectors to the cache"""
+        if not texts:
+            return
+        keys = [self._key(text) for text in texts]
+        array = np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dimension)
+        with self._locked(fcntl.LOCK_EX):
+            self._refresh()
+            # Append after the last whole row: a partial row left by an interrupted write would shift every later row
+            first_row = os.path.getsize(self.vectors_path) // self._row_bytes if os.path.exists(self.vectors_path) else 0
+            with open(self.vectors_path, "ab") as vectors_file:
+                vectors_file.truncate(first_row * self._row_bytes)
+                vectors_file.write(array.tobytes())
+            records = b"".join(INDEX_RECORD.pack(key, first_row + i) for i, key in enumerate(keys))
+            # Vectors are written before the index, so the index never points at a row that does not exist yet
+            with open(self.index_path, "ab") as index_file:
+                index_file.write(records)
+            self._refresh()
+            for key in keys:
+                self._clock += 1
+                self._last_used[key] = self._clock
+
+            if len(self._index) > self.max_entries:
+                self._compact()
+
+    def _compact(self):
+        """Rewrite the cache keeping the most recently used entries. Must be called under the exclusive lock."""
+        keep = int(self.max_entries * 0.75)
+        # Entries used by this process come first, then the most recently appended ones
+        ranked = sorted(self._index.items(), key=lambda item: (self._last_used.get(item[0], 0), item[1]), reverse=True)[:keep]
+        # Copy the kept rows in file order and in slices, so memory use stays bounded however large the cache is
+        ranked.sort(key=lambda item: item[1])
+
+        tmp_vectors_path, tmp_index_path = f"{self.vectors_path}.tmp", f"{self.index_path}.tmp"
+        with open(tmp_vectors_path, "wb") as vectors_file, open(tmp_index_path, "wb") as index_file:
+            for start in range(0, len(ranked), COMPACT_SLICE_ROWS):
+                entries = ranked[start:start + COMPACT_SLICE_ROWS]
+                rows = np.fromiter((row for _, row in entries), dtype=np.int64, count=len(entries))
+                self._vectors[rows].tofile(vectors_file)
+                index_file.write(b"".join(INDEX_RECORD.pack(key, start + offset) for offset, (key, _) in enumerate(entries)))
+        os.replace(tmp_vectors_path, self.vectors_path)
+        os.replace(tmp_index_path, self.index_path)
+
+        self._last_used = {key: self._last_used[key] for key, _ in ranked if key in self._last_used}
+        self._index_inode, self._vectors = None, None
+        self._refresh()
+        logger.info(f"🧹 Compacted embedding cache to {len(self._index)} entries")
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves passage embeddings from an `EmbeddingCache` and only runs the model on misses.
+    Query embeddings are not cached.
+    """
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.cache.get_many(texts)
+        misses = [i for i, vector in enumerate(vectors) if vector is None]
+        if misses:
+            # Identical chunks in the same batch are only embedded once
+            unique_texts = list(dict.fromkeys(texts[i] for i in misses))
+            computed = dict(zip(unique_texts, self.embeddings.embed_documents(unique_texts)))
+            self.cache.put_many(unique_texts, [computed[text] for text in unique_texts])
+            for i in misses:
+                vectors[i] = computed[texts[i]]
+        logger.info(f"🗃️ Embedding cache: {len(texts) - len(misses)}/{len(texts)} hits")
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
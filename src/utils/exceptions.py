@@ -5,4 +5,14 @@ class IndexNotFound(Exception):
     
     def __init__(self, message):
         self.message = message
-        super().__init__(self.message)
\ No newline at end of file
+        super().__init__(self.message)
+
+
+class DeadlineExceeded(Exception):
+    """
+    Exception raised when a request step doesn't finish before the request deadline
+    """
+    
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
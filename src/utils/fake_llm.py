@@ -0,0 +1,65 @@
+import os
+import time
+import asyncio
+from typing import Any, AsyncIterator, Iterator, List, Optional
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+class FakeLatencyChatModel(BaseChatModel):
+    """
+    Local stand-in for the chat model, used to exercise deadlines and hedging without calling Gemini.
+
+    Each call waits `first_token_latencies[i]` seconds (cycling over the list, i being the call number)
+    before its first token, then `token_latency` seconds between tokens.
+    """
+    response: str = "هذه إجابة تجريبية."
+    first_token_latencies: List[float] = [0.0]
+    token_latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-latency"
+
+    def _next_latency(self) -> float:
+        latency = self.first_token_latencies[self.calls % len(self.first_token_latencies)]
+        self.calls += 1
+        return latency
+
+    def _tokens(self) -> List[str]:
+        return self.response.split(" ")
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._next_latency() + self.token_latency * (len(self._tokens()) - 1))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._next_latency() + self.token_latency * (len(self._tokens()) - 1))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self._next_latency())
+        for i, token in enumerate(self._tokens()):
+            if i:
+                time.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token if i == 0 else " " + token))
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                       run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+                       **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self._next_latency())
+        for i, token in enumerate(self._tokens()):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token if i == 0 else " " + token))
+
+def fake_llm_from_env() -> FakeLatencyChatModel:
+    """Build the fake model from FAKE_LLM_LATENCIES (comma separated seconds) and FAKE_LLM_TOKEN_LATENCY"""
+    latencies = [float(latency) for latency in os.getenv("FAKE_LLM_LATENCIES", "0").split(",") if latency.strip()]
+    return FakeLatencyChatModel(first_token_latencies=latencies or [0.0],
+                                token_latency=float(os.getenv("FAKE_LLM_TOKEN_LATENCY", 0)))
@@ -0,0 +1,143 @@
+import os
+import re
+import json
+import asyncio
+import logging
+import numpy as np
+import redis
+import redis.asyncio as aioredis
+from typing import Any, Callable, Dict, List, Optional
+from dotenv import load_dotenv
+from .ingestion_jobs import ingestion_queue
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+# Minimum cosine similarity between a question and a canonical question for the precomputed answer to be served
+FAQ_SIMILARITY_THRESHOLD = float(os.getenv("FAQ_SIMILARITY_THRESHOLD", 0.92))
+
+def normalize_question(question: str) -> str:
+    """Normalize a question for exact matching: collapse whitespace, drop trailing punctuation and tatweel"""
+    question = question.replace("ـ", "")
+    question = re.sub(r"\s+", " ", question).strip().lower()
+    return question.rstrip("?؟!. ")
+
+def _questions_key(namespace: str) -> str:
+    return f"faq:{namespace}:questions"
+
+def _answers_key(namespace: str) -> str:
+    return f"faq:{namespace}:answers"
+
+def _version_key(namespace: str) -> str:
+    return f"faq:{namespace}:version"
+
+class FAQStore:
+    """
+    Canonical questions of each namespace and their precomputed answers, used by the admin UI and the workers.
+
+    Answers are stored in a hash keyed by normalized question, each entry holding the question, its answer,
+    its sources and the question embedding. A version counter is bumped whenever the answers are replaced,
+    so readers can cache them in memory.
+    """
+    def __init__(self, redis_url: str = REDIS_URL):
+        self.client = redis.Redis.from_url(redis_url, decode_responses=True)
+
+    def get_questions(self, namespace: str) -> List[str]:
+        """Get the canonical questions of a namespace"""
+        return json.loads(self.client.get(_questions_key(namespace)) or "[]")
+
+    def set_questions(self, namespace: str, questions: List[str]):
+        """Replace the canonical questions of a namespace"""
+        questions = list(dict.fromkeys(question.strip() for question in questions if question.strip()))
+        self.client.set(_questions_key(namespace), json.dumps(questions, ensure_ascii=False))
+
+    def get_answers(self, namespace: str) -> List[Dict[str, Any]]:
+        """Get the precomputed answers of a namespace"""
+        return [json.loads(entry) for entry in self.client.hvals(_answers_key(namespace))]
+
+    def replace_answers(self, namespace: str, entries: List[Dict[str, Any]]):
+        """Atomically replace the precomputed answers of a namespace"""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(_answers_key(namespace))
+        if entries:
+            pipe.hset(_answers_key(namespace), mapping={
+                normalize_question(entry["question"]): json.dumps(entry, ensure_ascii=False) for entry in entries
+            })
+        pipe.incr(_version_key(namespace))
+        pipe.execute()
+
+    def schedule_warmup(self, namespace: Optional[str]) -> Optional[str]:
+        """Queue a job recomputing the answers of a namespace, if it has canonical questions"""
+        namespace = namespace or ""
+        if not self.get_questions(namespace):
+            return None
+        return ingestion_queue.enqueue([], namespace=namespace, kind="faq_warm")
+
+class AsyncFAQLookup:
+    """
+    Serves precomputed answers to the chat endpoint, by exact match on the normalized question or by embedding
+    similarity to a canonical question. Answers are kept in memory and reloaded when their version changes,
+    so a lookup costs a single Redis GET.
+    """
+    def __init__(self, redis_url: str = REDIS_URL, threshold: float = FAQ_SIMILARITY_THRESHOLD):
+        self.client = aioredis.Redis.from_url(redis_url, decode_responses=True)
+        self.threshold = threshold
+        self._cache: Dict[str, Dict[str, Any]] = {}
+
+    async def _load(self, namespace: str, version: str) -> Dict[str, Any]:
+        """Get the answers of a namespace, from memory if they are up to date"""
+        cached = self._cache.get(namespace)
+        if cached is not None and cached["version"] == version:
+            return cached
+
+        entries = [json.loads(entry) for entry in await self.client.hvals(_answers_key(namespace))]
+        embedded = [entry for entry in entries if entry.get("embedding")]
+        cached = {
+            "version": version,
+            "exact": {normalize_question(entry["question"]): entry for entry in entries},
+            "entries": embedded,
+            "matrix": np.asarray([entry["embedding"] for entry in embedded], dtype=np.float32) if embedded else None,
+        }
+        self._cache[namespace] = cached
+        return cached
+
+    async def find(self, namespace: str, question: str,
+                   embed_query: Optional[Callable[[str], List[float]]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Find the precomputed answer to a question.
+
+        Args:
+            namespace (str): The Pinecone namespace.
+            question (str): The user's question.
+            embed_query (Callable[[str], List[float]], optional): Embeds the question for similarity matching.
+                Only exact matches are served if omitted.
+
+        Returns:
+            Optional[Dict[str, Any]]: The stored entry ({"question", "answer", "sources", ...}), or None.
+        """
+        version = await self.client.get(_version_key(namespace))
+        if version is None:
+            return None
+        cached = await self._load(namespace, version)
+
+        entry = cached["exact"].get(normalize_question(question))
+        if entry is not None or cached["matrix"] is None or embed_query is None:
+            return entry
+
+        # Embedding is CPU-bound, keep it off the event loop
+        vector = np.asarray(await asyncio.to_thread(embed_query, question), dtype=np.float32)
+        scores = cached["matrix"] @ vector
+        best = int(np.argmax(scores))
+        if scores[best] >= self.threshold:
+            logger.info(f"[FAQ] Matched canonical question with similarity {scores[best]:.3f}")
+            return cached["entries"][best]
+        return None
+
+    async def close(self):
+        await self.client.aclose()
+
+# Global instance
+faq_store = FAQStore()
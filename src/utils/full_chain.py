@@ -1,36 +1,58 @@
 import os
+import re
 import asyncio
+from functools import lru_cache
+from typing import Any, Dict, List
 from dotenv import load_dotenv
 # from langchain_openai import ChatOpenAI
+from langchain_core.documents import Document
 from langchain_core.prompts import PromptTemplate
 from langchain_pinecone import PineconeVectorStore
-from langchain.chains import ConversationalRetrievalChain
+from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
 from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain_huggingface import HuggingFaceEmbeddings
 import logging
-import base64
+from .Vector_db import encode_namespace, get_embedding_model
+from .retrieval_cache import CachedRetriever
+from .deadline import Deadline, LatencyTracker, hedged_completion
+from .exceptions import DeadlineExceeded
+from .fake_llm import fake_llm_from_env
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
 logger = logging.getLogger(__name__)
 # Load environment variables
 _ = load_dotenv(override=True)
 
-def create_retriever_chain(vectorstore, namespace: str = None):
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")  # "fake" for the local stand-in with injectable latency
+# Time budget of a chat request, after which an extractive answer is returned instead of the LLM one
+CHAT_DEADLINE_SECONDS = float(os.getenv("CHAT_DEADLINE_SECONDS", 25))
+EXTRACTIVE_MAX_SENTENCES = 3
+EXTRACTIVE_NOTE = "تعذر إعداد إجابة كاملة في الوقت المحدد، وهذه أقرب المقتطفات من المصادر:"
+NO_ANSWER_MESSAGE = "عذراً، استغرق إعداد الإجابة وقتاً أطول من المتوقع. يرجى المحاولة مرة أخرى."
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?؟۔])\s+|\n+")
+ARABIC_DIACRITICS = re.compile(r"[\u064B-\u0652\u0640]")
+
+def create_retriever(vectorstore, namespace: str = None):
     # Create retriever with optional namespace
     search_kwargs = {"k": 5, "fetch_k": 8, "score_threshold": 0.3}
     
     # Add namespace to search kwargs if provided
-    namespace = base64.urlsafe_b64encode(namespace.replace(" ", "-").lower().encode("utf-8")).decode("ascii") # Pinecone namespaces must be ASCII encoded
+    namespace = encode_namespace(namespace) # Pinecone namespaces must be ASCII encoded
     logger.info(f"[FULL CHAIN DEBUG] Namespace: {namespace}")
     if namespace:
         search_kwargs["namespace"] = namespace
     
-    retriever = vectorstore.as_retriever(search_kwargs=search_kwargs)
-    
-    llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", 
-                                 api_key=os.getenv('GOOGLE_API_KEY', ""), temperature=0.3)
-
-    template = """
+    # Repeated standalone questions are served from the retrieval cache until the namespace content changes
+    return CachedRetriever(retriever=vectorstore.as_retriever(search_kwargs=search_kwargs), namespace=namespace)
+
+@lru_cache(maxsize=1)
+def get_llm():
+    """Get the chat model, or a local fake with injectable latency when LLM_BACKEND=fake"""
+    if LLM_BACKEND == "fake":
+        return fake_llm_from_env()
+    return ChatGoogleGenerativeAI(model="gemini-2.5-flash", 
+                                  api_key=os.getenv('GOOGLE_API_KEY', ""), temperature=0.3)
+
+ANSWER_TEMPLATE = """
     You are a professional and knowledgeable AI assistant helping users retrieve information from a book.
 
     ---
@@ -58,18 +80,10 @@ def create_retriever_chain(vectorstore, namespace: str = None):
     ### 🧠 Answer (Arabic language):
     """
 
-    prompt = PromptTemplate(
-        input_variables=["context", "question"], 
-        template=template
-    )
-
-    return ConversationalRetrievalChain.from_llm(
-        llm=llm,
-        retriever=retriever,
-        return_source_documents=True,
-        combine_docs_chain_kwargs={"prompt": prompt, "document_variable_name": "context"},
-    )
-
+ANSWER_PROMPT = PromptTemplate(
+    input_variables=["context", "question"], 
+    template=ANSWER_TEMPLATE
+)
 
 index_name = 'non-profit-rag'
 try:
@@ -77,27 +91,107 @@ try:
 except RuntimeError:
     asyncio.set_event_loop(asyncio.new_event_loop())
 
-embedding_model = HuggingFaceEmbeddings(
-        model_name="intfloat/multilingual-e5-small",
-        model_kwargs={'device': 'cpu'},
-        encode_kwargs={'normalize_embeddings': True}
-        )
+# Shared with ingestion and the FAQ warm-up, so a process never loads the model twice
+embedding_model = get_embedding_model()
 vector_db = PineconeVectorStore(embedding=embedding_model, index_name=index_name)
 
-def get_response(user_query, chat_history, namespace: str = None):
+# First-token latencies of the answer calls, shared by the requests of this process
+answer_latencies = LatencyTracker()
+
+def _process_history(chat_history) -> List[tuple]:
     processed_history = []
     for msg in chat_history:
         if msg["isBot"] == "human" or msg["isBot"] is False:
             processed_history.append(("human", msg["content"]))
         elif msg["isBot"] == "ai" or msg["isBot"] is True:
             processed_history.append(("ai", msg["content"]))
-    
-    load_qa_chain = create_retriever_chain(vectorstore=vector_db, namespace=namespace)
-    
-    result = load_qa_chain.invoke(
-                {
-                    "question": user_query,
-                    "chat_history": processed_history,
-                }
+    return processed_history
+
+def _terms(text: str) -> set:
+    """Normalized words of a text, for overlap scoring"""
+    words = re.findall(r"\w+", ARABIC_DIACRITICS.sub("", text).lower())
+    return {word[2:] if word.startswith("ال") and len(word) > 4 else word for word in words if len(word) > 2}
+
+def extractive_answer(question: str, documents: List[Document], max_sentences: int = EXTRACTIVE_MAX_SENTENCES) -> str:
+    """
+    Build an answer without the LLM, from the retrieved sentences sharing the most words with the question.
+
+    Args:
+        question (str): The user's question.
+        documents (List[Document]): The retrieved documents.
+        max_sentences (int): The maximum number of quoted sentences. Defaults to EXTRACTIVE_MAX_SENTENCES.
+
+    Returns:
+        str: The answer.
+    """
+    question_terms = _terms(question)
+    sentences = [
+        sentence.strip() for document in documents
+        for sentence in SENTENCE_BOUNDARY.split(document.page_content) if sentence.strip()
+    ]
+    if not sentences:
+        return NO_ANSWER_MESSAGE
+
+    # Keep the best sentences in their original order, falling back to the top-ranked documents' opening sentences
+    scores = [len(question_terms & _terms(sentence)) for sentence in sentences]
+    best = sorted(range(len(sentences)), key=lambda i: (-scores[i], i))[:max_sentences]
+    quoted = [sentences[i] for i in sorted(best)]
+    return EXTRACTIVE_NOTE + "\n" + "\n".join(f"- {sentence}" for sentence in quoted)
+
+async def aget_response(user_query, chat_history, namespace: str = None, deadline: Deadline = None,
+                        llm=None) -> Dict[str, Any]:
+    """
+    Answer a question from the namespace documents, within a deadline.
+
+    The question is condensed with the chat history, the documents are retrieved, and the answer call is hedged:
+    if no token arrives within the usual first-token latency, a duplicate request is sent and the first to answer
+    wins. If the deadline expires, an extractive answer is built from the documents retrieved so far.
+
+    Args:
+        user_query (str): The user's question.
+        chat_history (list): The session messages, as returned by the chat history manager.
+        namespace (str, optional): The namespace name. Defaults to None.
+        deadline (Deadline, optional): The request deadline. Defaults to CHAT_DEADLINE_SECONDS from now.
+        llm (optional): The chat model. Defaults to get_llm().
+
+    Returns:
+        Dict[str, Any]: {"question", "answer", "source_documents", "degraded"}, degraded being True for
+            extractive answers.
+    """
+    deadline = deadline or Deadline(CHAT_DEADLINE_SECONDS)
+    llm = llm or get_llm()
+    processed_history = _process_history(chat_history)
+    retriever = create_retriever(vectorstore=vector_db, namespace=namespace)
+
+    question = user_query
+    source_documents = []
+    try:
+        if processed_history:
+            formatted_history = "\n".join(
+                f"{'Human' if role == 'human' else 'Assistant'}: {content}" for role, content in processed_history
             )
-    return result
\ No newline at end of file
+            condensed = await deadline.run(llm.ainvoke(
+                CONDENSE_QUESTION_PROMPT.format(chat_history=formatted_history, question=user_query)
+            ))
+            question = condensed.content
+
+        # The retriever is synchronous, keep it off the event loop
+        source_documents = await deadline.run(asyncio.to_thread(retriever.invoke, question))
+
+        context = "\n\n".join(document.page_content for document in source_documents)
+        answer = await hedged_completion(llm, ANSWER_PROMPT.format(context=context, question=question),
+                                         deadline, answer_latencies)
+        return {"question": question, "answer": answer, "source_documents": source_documents, "degraded": False}
+    except DeadlineExceeded:
+        logger.warning(f"⚠️ Deadline expired, answering from {len(source_documents)} retrieved documents")
+        return {
+            "question": question,
+            "answer": extractive_answer(user_query, source_documents),
+            "source_documents": source_documents,
+            "degraded": True,
+        }
+
+def get_response(user_query, chat_history, namespace: str = None, deadline: Deadline = None):
+    """Synchronous `aget_response`, for callers outside an event loop (workers, scripts)"""
+    # Reuse the loop set up at import rather than asyncio.run, since the model clients bind to the loop they first ran on
+    return asyncio.get_event_loop().run_until_complete(aget_response(user_query, chat_history, namespace, deadline))
@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import uuid
+import logging
+import redis
+from typing import List, Dict, Any, Optional
+from dotenv import load_dotenv
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+# Redis configuration
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/tmp/rag_uploads")  # Must be shared between the admin UI and the workers
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+JOB_TTL = int(os.getenv("JOB_TTL", 7 * 86400))  # 7 days
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", 300))  # A running job without a heartbeat for this long is requeued
+
+QUEUE_KEY = "ingest:queue"
+PROCESSING_KEY = "ingest:processing"
+JOBS_INDEX_KEY = "ingest:jobs"
+JOB_KEY_PREFIX = "ingest:job:"
+DEQUEUE_POLL_INTERVAL = 0.5
+
+# Move the next job to the processing list and record its heartbeat in one step, so requeue_stale never sees a
+# dequeued job with the heartbeat of a previous attempt (or none at all)
+DEQUEUE_SCRIPT = """
+local job_id = redis.call('LMOVE', KEYS[1], KEYS[2], 'LEFT', 'RIGHT')
+if job_id and redis.call('EXISTS', ARGV[1] .. job_id) == 1 then
+    redis.call('HSET', ARGV[1] .. job_id, 'heartbeat_at', ARGV[2])
+end
+return job_id
+"""
+
+class IngestionJobQueue:
+    """
+    Redis-backed queue of ingestion jobs.
+
+    A job is a hash holding its files, target namespace, status and checkpoint (the file being processed and
+    the number of its batches already stored). Workers move job IDs from the queue list to the processing list
+    atomically, so a job whose worker dies is never lost and can be requeued from its last checkpoint.
+    """
+    def __init__(self, redis_url: str = REDIS_URL):
+        self.client = redis.Redis.from_url(redis_url, decode_responses=True)
+        self._dequeue_script = self.client.register_script(DEQUEUE_SCRIPT)
+
+    def _get_job_key(self, job_id: str) -> str:
+        """Generate Redis key for job"""
+        return f"{JOB_KEY_PREFIX}{job_id}"
+
+    def enqueue(self, file_paths: List[str], namespace: Optional[str] = None, kind: str = "ingest") -> str:
+        """Create a job and push it onto the queue"""
+        job_id = uuid.uuid4().hex
+        now = int(time.time())
+        job = {
+            "id": job_id,
+            "kind": kind,
+            "namespace": namespace or "",
+            "files": json.dumps(file_paths),
+            "status": "queued",
+            "attempts": 0,
+            "file_index": 0,
+            "batch_index": 0,
+            "files_done": 0,
+            "chunks_done": 0,
+            "error": "",
+            "created_at": now,
+            "updated_at": now,
+            "heartbeat_at": 0,
+        }
+        key = self._get_job_key(job_id)
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping=job)
+        pipe.expire(key, JOB_TTL)
+        pipe.zadd(JOBS_INDEX_KEY, {job_id: now})
+        pipe.rpush(QUEUE_KEY, job_id)
+        pipe.execute()
+        logger.info(f"📥 Queued {kind} job {job_id} with {len(file_paths)} file(s)")
+        return job_id
+
+    def dequeue(self, timeout: int = 5) -> Optional[str]:
+        """Wait up to `timeout` seconds for a job and move it to the processing list"""
+        # Scripts cannot block, so poll instead of BLMOVE
+        deadline = time.monotonic() + timeout
+        while True:
+            job_id = self._dequeue_script(keys=[QUEUE_KEY, PROCESSING_KEY], args=[JOB_KEY_PREFIX, int(time.time())])
+            if job_id is not None or time.monotonic() >= deadline:
+                return job_id
+            time.sleep(DEQUEUE_POLL_INTERVAL)
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job with its counters decoded"""
+        job = self.client.hgetall(self._get_job_key(job_id))
+        if not job:
+            return None
+        job["files"] = json.loads(job.get("files", "[]"))
+        for field in ("attempts", "file_index", "batch_index", "files_done", "chunks_done",
+                      "created_at", "updated_at", "heartbeat_at"):
+            job[field] = int(job.get(field, 0))
+        return job
+
+    def list_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Get the most recent jobs, newest first"""
+        job_ids = self.client.zrevrange(JOBS_INDEX_KEY, 0, limit - 1)
+        jobs = []
+        for job_id in job_ids:
+            job = self.get_job(job_id)
+            if job is None:
+                # The job hash expired, drop it from the index too
+                self.client.zrem(JOBS_INDEX_KEY, job_id)
+                continue
+            jobs.append(job)
+        return jobs
+
+    def update(self, job_id: str, **fields):
+        """Update job fields"""
+        fields["updated_at"] = int(time.time())
+        self.client.hset(self._get_job_key(job_id), mapping=fields)
+
+    def start(self, job_id: str, worker: str):
+        """Mark a dequeued job as running"""
+        now = int(time.time())
+        key = self._get_job_key(job_id)
+        pipe = self.client.pipeline()
+        pipe.hincrby(key, "attempts", 1)
+        pipe.hset(key, mapping={"status": "running", "worker": worker, "error": "",
+                                "heartbeat_at": now, "updated_at": now})
+        pipe.execute()
+
+    def heartbeat(self, job_id: str):
+        """Record that the worker running the job is still alive"""
+        self.client.hset(self._get_job_key(job_id), "heartbeat_at", int(time.time()))
+
+    def checkpoint(self, job_id: str, file_index: int, batch_index: int, chunks: int = 0):
+        """Record that `batch_index` batches of file `file_index` are stored"""
+        key = self._get_job_key(job_id)
+        now = int(time.time())
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={"file_index": file_index, "batch_index": batch_index,
+                                "heartbeat_at": now, "updated_at": now})
+        if chunks:
+            pipe.hincrby(key, "chunks_done", chunks)
+        pipe.execute()
+
+    def complete(self, job_id: str):
+        """Mark a job as completed and remove it from the processing list"""
+        self.update(job_id, status="completed")
+        self.client.lrem(PROCESSING_KEY, 0, job_id)
+        logger.info(f"✅ Job {job_id} completed")
+
+    def discard(self, job_id: str):
+        """Remove a job whose hash no longer exists from the processing list, without recreating its hash"""
+        self.client.lrem(PROCESSING_KEY, 0, job_id)
+
+    def fail(self, job_id: str, error: str) -> bool:
+        """
+        Record a failed attempt. The job is requeued (keeping its checkpoint) until it reaches JOB_MAX_ATTEMPTS.
+
+        Returns:
+            bool: True if the job was requeued, False if it is now marked as failed.
+        """
+        job = self.get_job(job_id)
+        self.client.lrem(PROCESSING_KEY, 0, job_id)
+        if job is None:
+            return False
+        if job["attempts"] < JOB_MAX_ATTEMPTS:
+            self.update(job_id, status="queued", error=error)
+            self.client.rpush(QUEUE_KEY, job_id)
+            logger.warning(f"⚠️ Job {job_id} failed (attempt {job['attempts']}/{JOB_MAX_ATTEMPTS}), requeued: {error}")
+            return True
+        self.update(job_id, status="failed", error=error)
+        logger.error(f"❌ Job {job_id} failed: {error}")
+        return False
+
+    def retry(self, job_id: str):
+        """Requeue a failed job from its last checkpoint"""
+        self.update(job_id, status="queued", attempts=0, error="")
+        self.client.rpush(QUEUE_KEY, job_id)
+
+    def requeue_stale(self) -> int:
+        """Requeue running jobs whose worker stopped sending heartbeats"""
+        requeued = 0
+        now = int(time.time())
+        for job_id in self.client.lrange(PROCESSING_KEY, 0, -1):
+            job = self.get_job(job_id)
+            if job is not None and now - job["heartbeat_at"] < JOB_STALE_SECONDS:
+                continue
+            # Only the worker that manages to remove the ID requeues it
+            if self.client.lrem(PROCESSING_KEY, 1, job_id):
+                if job is not None:
+                    self.update(job_id, status="queued")
+                    self.client.rpush(QUEUE_KEY, job_id)
+                    requeued += 1
+                    logger.warning(f"⚠️ Requeued stale job {job_id}")
+        return requeued
+
+# Global instance
+ingestion_queue = IngestionJobQueue()
@@ -0,0 +1,149 @@
+import os
+import time
+import random
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from dotenv import load_dotenv
+from pinecone import Pinecone
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+_ = load_dotenv(override=True)
+
+UPSERT_CONCURRENCY = int(os.getenv("UPSERT_CONCURRENCY", 4))
+UPSERT_MAX_RETRIES = int(os.getenv("UPSERT_MAX_RETRIES", 5))
+UPSERT_BACKOFF_SECONDS = float(os.getenv("UPSERT_BACKOFF_SECONDS", 0.5))
+UPSERT_BACKOFF_MAX_SECONDS = float(os.getenv("UPSERT_BACKOFF_MAX_SECONDS", 8))
+# Decimals kept when vectors are sent as JSON: Pinecone stores float32, so further digits only inflate the request
+UPSERT_VECTOR_DECIMALS = int(os.getenv("UPSERT_VECTOR_DECIMALS", 7))
+# "grpc" sends vectors as protobuf float32 when pinecone[grpc] is installed, "rest" always uses JSON
+PINECONE_TRANSPORT = os.getenv("PINECONE_TRANSPORT", "grpc")
+# Overrides the index host, e.g. to write to Pinecone Local or a recording stand-in
+PINECONE_INDEX_HOST = os.getenv("PINECONE_INDEX_HOST", "")
+# PineconeVectorStore keeps the chunk text under this metadata key
+TEXT_KEY = "text"
+
+# gRPC status codes worth retrying, any other gRPC error (e.g. INVALID_ARGUMENT on a dimension mismatch) is permanent
+RETRYABLE_GRPC_CODES = {"UNAVAILABLE", "RESOURCE_EXHAUSTED", "DEADLINE_EXCEEDED"}
+
+def _is_retryable(error: Exception) -> bool:
+    """
+    Client errors other than rate limiting will fail again, everything else (5xx, timeouts, resets) may not.
+    The gRPC client raises a PineconeException caused by the RpcError, so the cause chain is checked for a status code.
+    """
+    cause = error
+    while cause is not None:
+        code = getattr(cause, "code", None)
+        if callable(code):
+            return getattr(code(), "name", None) in RETRYABLE_GRPC_CODES
+        cause = cause.__cause__
+    status = getattr(error, "status", None)
+    return not (isinstance(status, int) and 400 <= status < 500 and status != 429)
+
+class PineconeWriter:
+    """
+    Upserts precomputed vectors into a Pinecone namespace, with retries and exponential backoff.
+
+    Vectors are sent as protobuf float32 over gRPC when available, and otherwise as JSON rounded to
+    UPSERT_VECTOR_DECIMALS, which roughly halves the request size compared to full double precision.
+    """
+    def __init__(self, index_name: str = 'non-profit-rag', namespace: Optional[str] = None,
+                 host: str = PINECONE_INDEX_HOST, transport: str = PINECONE_TRANSPORT):
+        api_key = os.getenv('PINECONE_API_KEY', "")
+        self.namespace = namespace or ""
+        self.transport = "rest"
+        client = None
+        if transport == "grpc":
+            try:
+                from pinecone.grpc import PineconeGRPC
+                client = PineconeGRPC(api_key=api_key)
+                self.transport = "grpc"
+            except ImportError:
+                logger.info("pinecone[grpc] is not installed, upserting over REST")
+        client = client or Pinecone(api_key=api_key)
+        self.index = client.Index(host=host) if host else client.Index(index_name)
+        # Records are built by to_record, so skip the REST client's per-value type checks (about half its CPU time)
+        self._upsert_kwargs = {"_check_type": False} if self.transport == "rest" else {}
+
+    def to_record(self, id_: str, values: List[float], text: str, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the upsert record of a chunk, in the layout PineconeVectorStore reads back"""
+        if self.transport == "rest":
+            values = [round(value, UPSERT_VECTOR_DECIMALS) for value in values]
+        return {"id": id_, "values": values, "metadata": {**metadata, TEXT_KEY: text}}
+
+    def upsert(self, records: List[Dict[str, Any]], label: str = "") -> int:
+        """
+        Upsert records in a single request, retrying retryable failures with jittered exponential backoff.
+
+        Args:
+            records (List[Dict[str, Any]]): The records built by `to_record`.
+            label (str): Prefix of the throughput log line. Defaults to "".
+
+        Returns:
+            int: The number of upserted records.
+        """
+        for attempt in range(UPSERT_MAX_RETRIES):
+            start = time.perf_counter()
+            try:
+                self.index.upsert(vectors=records, namespace=self.namespace, **self._upsert_kwargs)
+                break
+            except Exception as e:
+                if attempt == UPSERT_MAX_RETRIES - 1 or not _is_retryable(e):
+                    raise
+                delay = min(UPSERT_BACKOFF_MAX_SECONDS, UPSERT_BACKOFF_SECONDS * 2 ** attempt) * random.uniform(0.5, 1)
+                logger.warning(f"⚠️ {label}upsert failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+        elapsed = time.perf_counter() - start
+        logger.info(f"📦 {label}{len(records)} vectors in {elapsed:.2f}s ({len(records) / max(elapsed, 1e-9):.0f} vectors/s)")
+        return len(records)
+
+def upsert_concurrently(writer: PineconeWriter, batches: Iterable[List[Dict[str, Any]]],
+                        concurrency: int = UPSERT_CONCURRENCY,
+                        on_batch: Optional[Callable[[int, int], None]] = None, first_batch: int = 0) -> int:
+    """
+    Upserts batches of records with up to `concurrency` requests in flight. Batches are produced lazily, so
+    building (e.g. embedding) the next batches overlaps with the upload of the previous ones.
+
+    Args:
+        writer (PineconeWriter): The destination.
+        batches (Iterable[List[Dict[str, Any]]]): The record batches.
+        concurrency (int): The maximum number of concurrent upserts. Defaults to UPSERT_CONCURRENCY.
+        on_batch (Callable[[int, int], None], optional): Called with (batch_index, records_in_batch) in batch order,
+            once the batch and every batch before it are stored.
+        first_batch (int): The index of the first batch, for checkpoints and logs. Defaults to 0.
+
+    Returns:
+        int: The number of upserted records.
+    """
+    upserted = 0
+    in_flight = deque()
+    start = time.perf_counter()
+
+    def settle_oldest():
+        nonlocal upserted
+        batch_index, future = in_flight.popleft()
+        count = future.result()
+        upserted += count
+        if on_batch is not None:
+            on_batch(batch_index, count)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        try:
+            for batch_index, records in enumerate(batches, start=first_batch):
+                if len(in_flight) >= concurrency:
+                    settle_oldest()
+                in_flight.append((batch_index, executor.submit(writer.upsert, records, f"Batch {batch_index}: ")))
+            while in_flight:
+                settle_oldest()
+        finally:
+            # Do not start batches that are still queued once one has failed
+            for _, future in in_flight:
+                future.cancel()
+
+    elapsed = time.perf_counter() - start
+    if upserted:
+        logger.info(f"✅ Upserted {upserted} vectors in {elapsed:.1f}s ({upserted / max(elapsed, 1e-9):.0f} vectors/s)")
+    return upserted
@@ -1,12 +1,13 @@
 import asyncio
-import json
 import redis.asyncio as redis
-from typing import List, Dict, Any, Optional
+from collections import OrderedDict
+from typing import Callable, List, Dict, Any, Optional
 # from datetime import timedelta
 from dotenv import load_dotenv
 import os
 import logging
 import time
+from .chat_codec import encode_message, decode_message
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
 logger = logging.getLogger(__name__)
@@ -17,20 +18,126 @@ load_dotenv()
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
 SESSION_TTL = int(os.getenv("SESSION_TTL", 86400))  # 24 hours
 
+# In-process (L1) cache of session histories, kept coherent across workers with Redis client-side caching
+CHAT_L1_CACHE = os.getenv("CHAT_L1_CACHE", "false").lower() == "true"
+CHAT_L1_MAX_SESSIONS = int(os.getenv("CHAT_L1_MAX_SESSIONS", 1000))
+CHAT_L1_MAX_BYTES = int(os.getenv("CHAT_L1_MAX_BYTES", 32 * 1024 * 1024))  # 32 MiB
+# With the L1 cache on, a worker's chat writes share one tracking connection and wait at most this long for it
+CHAT_L1_WRITE_TIMEOUT = float(os.getenv("CHAT_L1_WRITE_TIMEOUT", 5))
+
+KEY_PREFIX = "chat_history:"
+INVALIDATION_CHANNEL = "__redis__:invalidate"
+# How often the listener checks that the writer connection still has tracking on (seconds). Invalidations are lost
+# while the writer is disconnected, so the cache is cleared whenever it reconnects.
+TRACKING_CHECK_INTERVAL = 5
+
+class TrackingConnection(redis.Connection):
+    """
+    Connection that turns on broadcast client tracking for chat history keys as soon as it connects (and on every
+    reconnect), redirecting invalidation messages to the manager's listener. NOLOOP keeps the writes made through
+    this connection from invalidating the writer's own cache.
+    """
+    def __init__(self, *args, tracking_redirect: int, on_tracking_enabled: Optional[Callable[[], None]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tracking_redirect = tracking_redirect
+        self.on_tracking_enabled = on_tracking_enabled
+
+    async def on_connect_check_health(self, check_health: bool = True):
+        # connect() only calls this hook in redis-py 6 (on_connect is reserved for Unix sockets)
+        await super().on_connect_check_health(check_health=check_health)
+        await self.send_command("CLIENT", "TRACKING", "ON", "REDIRECT", self.tracking_redirect,
+                                "BCAST", "PREFIX", KEY_PREFIX, "NOLOOP")
+        response = await self.read_response()
+        if response not in (b"OK", "OK"):
+            raise redis.ConnectionError(f"Failed to enable client tracking: {response}")
+        if self.on_tracking_enabled is not None:
+            self.on_tracking_enabled()
+
+class SessionHistoryCache:
+    """LRU cache of decoded session histories, bounded by number of sessions and approximate size in bytes"""
+    def __init__(self, max_sessions: int = CHAT_L1_MAX_SESSIONS, max_bytes: int = CHAT_L1_MAX_BYTES):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self.size_bytes = 0
+        # Incremented on every invalidation, so a read that raced with one is not cached
+        self.epoch = 0
+
+    @staticmethod
+    def _message_size(message: Dict[str, Any]) -> int:
+        # CPython stores Arabic text with 2 bytes per character, plus a rough per-message overhead
+        return 2 * len(message.get("content", "")) + 64
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        messages = self._entries.get(key)
+        if messages is not None:
+            self._entries.move_to_end(key)
+        return messages
+
+    def set(self, key: str, messages: List[Dict[str, Any]]):
+        self.discard(key)
+        size = sum(self._message_size(message) for message in messages)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = messages
+        self._sizes[key] = size
+        self.size_bytes += size
+        self._evict()
+
+    def append(self, key: str, message: Dict[str, Any]):
+        self._entries[key].append(message)
+        size = self._message_size(message)
+        self._sizes[key] += size
+        self.size_bytes += size
+        self._entries.move_to_end(key)
+        self._evict()
+
+    def discard(self, key: str):
+        if key in self._entries:
+            del self._entries[key]
+            self.size_bytes -= self._sizes.pop(key)
+
+    def invalidate(self, keys: Optional[List[str]] = None):
+        """Drop the given keys, or everything if keys is None (e.g. after FLUSHDB)"""
+        self.epoch += 1
+        if keys is None:
+            self._entries.clear()
+            self._sizes.clear()
+            self.size_bytes = 0
+            return
+        for key in keys:
+            self.discard(key)
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_sessions or self.size_bytes > self.max_bytes):
+            key, _ = self._entries.popitem(last=False)
+            self.size_bytes -= self._sizes.pop(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
 class AsyncRedisChatManager:
-    def __init__(self):
+    def __init__(self, l1_cache: bool = CHAT_L1_CACHE):
         self.redis_url = REDIS_URL
         self.session_ttl = SESSION_TTL
         self._redis_pool = None
         self.client: Optional[redis.Redis] = None
+
+        # L1 cache state. The cache is only used while the invalidation listener is connected.
+        self.l1_enabled = l1_cache
+        self._l1 = SessionHistoryCache()
+        self._l1_active = False
+        self._writer: Optional[redis.Redis] = None
+        self._invalidation_task: Optional[asyncio.Task] = None
     
     async def initialize(self):
         """Initialize Redis connection pool"""
         if self._redis_pool is None:
             self._redis_pool = redis.ConnectionPool.from_url(
                 self.redis_url,
-                encoding="utf-8",
-                decode_responses=True,
+                # Messages are stored in a binary format, see chat_codec
+                decode_responses=False,
                 max_connections=10,
                 db=0
             )
@@ -38,7 +145,77 @@ class AsyncRedisChatManager:
         if self.client is None:
             self.client = redis.Redis(connection_pool=self._redis_pool)
             logger.info("✅ Redis client initialized")
+        if self.l1_enabled and self._invalidation_task is None:
+            self._invalidation_task = asyncio.create_task(self._listen_for_invalidations())
+
+    async def _listen_for_invalidations(self):
+        """
+        Keep the L1 cache coherent with Redis.
+
+        A dedicated connection subscribes to the invalidation channel, and writes go through a single tracking
+        connection redirecting to it, so Redis notifies this worker of every change another client makes to a
+        chat history key (writes, deletes, expirations). If the listener connection drops, the cache is cleared
+        and disabled until tracking is set up again. The writer's tracking is checked every TRACKING_CHECK_INTERVAL
+        seconds, and the cache is cleared whenever the writer reconnects.
+        """
+        retry_delay = 1
+        while True:
+            listener = self._redis_pool.make_connection()
+            try:
+                await listener.connect()
+                await listener.send_command("CLIENT", "ID")
+                client_id = int(await listener.read_response())
+                await listener.send_command("SUBSCRIBE", INVALIDATION_CHANNEL)
+                await listener.read_response()
+
+                self._writer = redis.Redis(connection_pool=redis.BlockingConnectionPool(
+                    max_connections=1,
+                    timeout=CHAT_L1_WRITE_TIMEOUT,
+                    connection_class=TrackingConnection,
+                    tracking_redirect=client_id,
+                    # Changes made while the writer was disconnected were not notified
+                    on_tracking_enabled=self._l1.invalidate,
+                    **self._redis_pool.connection_kwargs
+                ))
+                await self._check_tracking(client_id)
+                self._l1_active = True
+                retry_delay = 1
+                logger.info("✅ Chat history L1 cache enabled")
+
+                while True:
+                    response = await listener.read_response(timeout=TRACKING_CHECK_INTERVAL)
+                    if response is None:
+                        # Reconnects the writer (re-enabling tracking) if it was disconnected, or raises
+                        await self._check_tracking(client_id)
+                        continue
+                    if not isinstance(response, list) or len(response) < 3 or response[0] != b"message":
+                        continue
+                    keys = response[2]
+                    self._l1.invalidate(None if keys is None else [key.decode("utf-8") for key in keys])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Chat history L1 cache disabled, invalidation listener failed: {e}")
+            finally:
+                self._l1_active = False
+                self._l1.invalidate()
+                await listener.disconnect()
+                if self._writer is not None:
+                    await self._writer.aclose(close_connection_pool=True)
+                    self._writer = None
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 30)
     
+    async def _check_tracking(self, client_id: int):
+        """Make sure the writer connection redirects broadcast invalidations to the listener, or raise"""
+        response = await self._writer.execute_command("CLIENT", "TRACKINGINFO")
+        if isinstance(response, list):
+            response = dict(zip(response[::2], response[1::2]))
+        info = {(key.decode() if isinstance(key, bytes) else key): value for key, value in response.items()}
+        flags = {flag.decode() if isinstance(flag, bytes) else flag for flag in info.get("flags", [])}
+        if not {"on", "bcast"} <= flags or int(info.get("redirect", -1)) != client_id:
+            raise redis.ConnectionError(f"Client tracking is not enabled on the writer connection: {info}")
+
     async def health_check(self) -> bool:
         """Check if Redis is connected and responsive"""
         try:
@@ -50,7 +227,7 @@ class AsyncRedisChatManager:
     
     def _get_session_key(self, session_id: str, namespace: str) -> str:
         """Generate Redis key for session"""
-        return f"chat_history:{namespace}:{session_id}"
+        return f"{KEY_PREFIX}{namespace}:{session_id}"
     
     async def add_message(self, session_id: str, namespace: str, isBot: bool, content: str):
         """Add message to chat history"""
@@ -58,30 +235,50 @@ class AsyncRedisChatManager:
             await self.initialize()
 
         key = self._get_session_key(session_id=session_id, namespace=namespace)
-        message = {
-            "isBot": isBot,
-            "content": content,
-            "timestamp": int(time.time())
-        }
-
-        await self.client.rpush(key, json.dumps(message))
-        ok = await self.client.expire(key, int(self.session_ttl))
+        message = encode_message(isBot=isBot, content=content, timestamp=int(time.time()))
+
+        l1_active = self._l1_active
+        # Writes go through the tracking connection so that they do not invalidate our own cache
+        client = self._writer if l1_active else self.client
+        # One round trip, since with the L1 cache on every write of this worker is serialized on a single connection
+        async with client.pipeline(transaction=True) as pipe:
+            pipe.rpush(key, message)
+            pipe.expire(key, int(self.session_ttl))
+            length, ok = await pipe.execute()
         if not ok:
             logger.warning(f"[WARN] Failed to set TTL for {key}")
-        else:
-            ttl = await self.client.ttl(key)
+
+        if l1_active and self._l1_active:
+            # Write-through, as long as the cached list is exactly the list we appended to
+            cached = self._l1.get(key)
+            if length == 1:
+                self._l1.set(key, [decode_message(message)])
+            elif cached is not None and len(cached) + 1 == length:
+                self._l1.append(key, decode_message(message))
+            else:
+                self._l1.discard(key)
     
     async def get_messages(self, session_id: str, namespace: str, limit: int = 100) -> List[Dict[str, Any]]:
         """Get all messages for a session"""
         key = self._get_session_key(session_id=session_id, namespace=namespace)
-        messages_json = await self.client.lrange(key, 0, -1)
+        if self._l1_active:
+            cached = self._l1.get(key)
+            if cached is not None:
+                return cached[::-1]
+        epoch = self._l1.epoch
+
+        raw_messages = await self.client.lrange(key, 0, -1)
         messages = []
-        for msg_json in messages_json:
+        for raw_message in raw_messages:
             try:
-                messages.append(json.loads(msg_json))
-            except json.JSONDecodeError:
+                # Also reads messages stored as JSON before the binary format was introduced
+                messages.append(decode_message(raw_message))
+            except ValueError:
                 # Handle corrupted messages gracefully
                 continue
+
+        if self._l1_active and self._l1.epoch == epoch:
+            self._l1.set(key, messages)
         
         return messages[::-1] # For some reason, the frontend renders the messages in a reversed order. And honestly, this was easier than trying to get the frontend to render them in a correct order.
     
@@ -108,16 +305,28 @@ class AsyncRedisChatManager:
     async def clear_history(self, session_id: str, namespace: str):
         """Clear chat history for session"""
         key = self._get_session_key(session_id=session_id, namespace=namespace)
-        await self.client.delete(key)
+        if self._l1_active:
+            await self._writer.delete(key)
+            if self._l1_active:
+                self._l1.set(key, [])
+        else:
+            await self.client.delete(key)
     
     async def get_session_ids(self, pattern: str = "chat_history:*:*") -> List[str]:
         """Get all session IDs (for admin/debug)"""
         keys = await self.client.keys(pattern)
         # Extract session IDs from keys
-        return [key.split(":")[-1] for key in keys]
+        return [key.decode("utf-8").split(":")[-1] for key in keys]
     
     async def close(self):
         """Close Redis connection pool"""
+        if self._invalidation_task is not None:
+            self._invalidation_task.cancel()
+            try:
+                await self._invalidation_task
+            except asyncio.CancelledError:
+                pass
+            self._invalidation_task = None
         if self._redis_pool:
             await self._redis_pool.disconnect()
             logger.info("✅ Redis connection pool closed")
@@ -0,0 +1,85 @@
+import os
+import json
+import hashlib
+import logging
+import redis
+from typing import List, Optional
+from dotenv import load_dotenv
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+RETRIEVAL_CACHE_TTL = int(os.getenv("RETRIEVAL_CACHE_TTL", 3600))  # 1 hour, 0 disables the cache
+
+_client: Optional[redis.Redis] = None
+
+def _get_client() -> redis.Redis:
+    """Lazily create the Redis client shared by the cache and the namespace versions"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    return _client
+
+def _version_key(namespace: str) -> str:
+    return f"namespace_version:{namespace}"
+
+def get_namespace_version(namespace: Optional[str]) -> int:
+    """Get the content version of a namespace"""
+    return int(_get_client().get(_version_key(namespace or "")) or 0)
+
+def bump_namespace_version(namespace: Optional[str]):
+    """
+    Mark the content of a namespace as changed, so that cached retrieval results for it are no longer used.
+    Must be called after every write to or deletion from the namespace. Failures are only logged, the cached
+    results then expire with their TTL.
+    """
+    try:
+        _get_client().incr(_version_key(namespace or ""))
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to bump the version of namespace '{namespace}': {e}")
+
+class CachedRetriever(BaseRetriever):
+    """
+    Retriever caching the documents returned for a (namespace, content version, question) in Redis.
+
+    Since the version is bumped by ingestion and deletion, a cached result is never served for content that
+    changed since it was retrieved, and repeated standalone questions skip both the query embedding and the
+    vector store round-trip.
+    """
+    retriever: BaseRetriever
+    namespace: str = ""
+    ttl: int = RETRIEVAL_CACHE_TTL
+
+    def _cache_key(self, version: int, query: str) -> str:
+        digest = hashlib.sha256(query.strip().encode("utf-8")).hexdigest()
+        return f"retrieval:{self.namespace}:{version}:{digest}"
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        if self.ttl <= 0:
+            return self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+
+        key = None
+        try:
+            key = self._cache_key(get_namespace_version(self.namespace), query)
+            cached = _get_client().get(key)
+            if cached is not None:
+                logger.info("[RETRIEVAL CACHE] Hit")
+                return [Document(**doc) for doc in json.loads(cached)]
+        except Exception as e:
+            logger.warning(f"[RETRIEVAL CACHE] Lookup failed: {e}")
+
+        documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+
+        if key is not None:
+            try:
+                payload = [{"id": doc.id, "page_content": doc.page_content, "metadata": doc.metadata} for doc in documents]
+                _get_client().set(key, json.dumps(payload, ensure_ascii=False), ex=self.ttl)
+            except Exception as e:
+                logger.warning(f"[RETRIEVAL CACHE] Store failed: {e}")
+        return documents
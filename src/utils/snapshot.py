@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import logging
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import Any, Dict, Iterator, List
+from dotenv import load_dotenv
+from pinecone import Pinecone
+from .pinecone_upsert import PineconeWriter, TEXT_KEY
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(message)s')
+logger = logging.getLogger(__name__)
+
+_ = load_dotenv(override=True)
+
+SNAPSHOT_BATCH_SIZE = int(os.getenv("SNAPSHOT_BATCH_SIZE", 100))
+SNAPSHOT_CONCURRENCY = int(os.getenv("SNAPSHOT_CONCURRENCY", 8))
+SNAPSHOT_MAX_RETRIES = 3
+
+def snapshot_schema(dimension: int) -> pa.Schema:
+    """Columnar layout of a namespace snapshot"""
+    return pa.schema([
+        ("id", pa.string()),
+        ("values", pa.list_(pa.float32(), dimension)),
+        ("text", pa.string()),
+        ("metadata", pa.string()),  # JSON, without the text
+    ])
+
+def snapshot_dimension(input_path: str) -> int:
+    """Read the vector dimension of a snapshot from its schema metadata"""
+    schema = pq.ParquetFile(input_path).schema_arrow
+    metadata = schema.metadata or {}
+    if b"dimension" in metadata:
+        return int(metadata[b"dimension"])
+    return schema.field("values").type.list_size
+
+def _with_retries(func, *args, **kwargs):
+    """Call func, retrying with exponential backoff"""
+    for attempt in range(SNAPSHOT_MAX_RETRIES):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt == SNAPSHOT_MAX_RETRIES - 1:
+                raise
+            delay = 2 ** attempt
+            logger.warning(f"⚠️ {e}, retrying in {delay}s")
+            time.sleep(delay)
+
+def _batched(iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+class PineconeTarget:
+    """Writes snapshot rows into a Pinecone namespace, reusing the stored vectors"""
+    def __init__(self, index_name: str = 'non-profit-rag', namespace: str = ""):
+        self.writer = PineconeWriter(index_name=index_name, namespace=namespace)
+
+    def upsert(self, ids: List[str], vectors: List[List[float]], texts: List[str], metadatas: List[Dict[str, Any]]):
+        self.writer.upsert([
+            self.writer.to_record(id_, values, text, metadata)
+            for id_, values, text, metadata in zip(ids, vectors, texts, metadatas)
+        ])
+
+class VectorStoreTarget:
+    """
+    Writes snapshot rows into any LangChain vector store. Stores that accept precomputed embeddings
+    (`add_embeddings`) reuse the stored vectors; other stores re-embed the texts.
+    """
+    def __init__(self, vector_store):
+        self.vector_store = vector_store
+
+    def upsert(self, ids: List[str], vectors: List[List[float]], texts: List[str], metadatas: List[Dict[str, Any]]):
+        if hasattr(self.vector_store, "add_embeddings"):
+            _with_retries(self.vector_store.add_embeddings, text_embeddings=list(zip(texts, vectors)),
+                          metadatas=metadatas, ids=ids)
+        else:
+            _with_retries(self.vector_store.add_texts, texts=texts, metadatas=metadatas, ids=ids)
+
+def export_namespace(output_path: str, namespace: str = "", index_name: str = 'non-profit-rag',
+                     batch_size: int = SNAPSHOT_BATCH_SIZE, concurrency: int = SNAPSHOT_CONCURRENCY) -> int:
+    """
+    Streams the IDs, vectors, texts and metadata of a Pinecone namespace to a Parquet file.
+
+    Args:
+        output_path (str): The Parquet file to write.
+        namespace (str): The Pinecone namespace to export. Defaults to "" (the default namespace).
+        index_name (str): The name of the index. Defaults to 'non-profit-rag'.
+        batch_size (int): The number of vectors fetched per request and written per row group. Defaults to SNAPSHOT_BATCH_SIZE.
+        concurrency (int): The number of concurrent fetch requests. Defaults to SNAPSHOT_CONCURRENCY.
+
+    Returns:
+        int: The number of exported vectors.
+    """
+    pinecone = Pinecone(api_key=os.getenv('PINECONE_API_KEY', ""))
+    index = pinecone.Index(index_name)
+    dimension = pinecone.describe_index(index_name).dimension
+    schema = snapshot_schema(dimension).with_metadata({
+        "index_name": index_name, "namespace": namespace, "dimension": str(dimension)
+    })
+
+    def fetch(ids: List[str]) -> pa.RecordBatch:
+        fetched = _with_retries(index.fetch, ids=ids, namespace=namespace).vectors
+        columns = {"id": [], "values": [], "text": [], "metadata": []}
+        for id_ in ids:
+            if id_ not in fetched:
+                continue  # Deleted since it was listed
+            metadata = dict(fetched[id_].metadata or {})
+            columns["id"].append(id_)
+            columns["values"].append(fetched[id_].values)
+            columns["text"].append(metadata.pop(TEXT_KEY, ""))
+            columns["metadata"].append(json.dumps(metadata, ensure_ascii=False))
+        return pa.RecordBatch.from_pydict(columns, schema=schema)
+
+    exported = 0
+    start = time.perf_counter()
+    all_ids = (id_ for page in index.list(namespace=namespace) for id_ in page)
+    with pq.ParquetWriter(output_path, schema, compression="zstd") as writer, ThreadPoolExecutor(concurrency) as executor:
+        # Fetch `concurrency` batches at a time, writing them in order
+        for window in _batched(_batched(all_ids, batch_size), concurrency):
+            for record_batch in executor.map(fetch, window):
+                writer.write_batch(record_batch)
+                exported += record_batch.num_rows
+            logger.info(f"📤 Exported {exported} vectors...")
+
+    logger.info(f"✅ Exported {exported} vectors from namespace '{namespace}' in {time.perf_counter() - start:.1f}s")
+    return exported
+
+def import_namespace(input_path: str, target, batch_size: int = SNAPSHOT_BATCH_SIZE,
+                     concurrency: int = SNAPSHOT_CONCURRENCY) -> int:
+    """
+    Streams a Parquet snapshot into a vector store with concurrent batched upserts.
+
+    Args:
+        input_path (str): The Parquet file written by `export_namespace`.
+        target: The destination, e.g. a PineconeTarget or a VectorStoreTarget.
+        batch_size (int): The number of vectors per upsert. Defaults to SNAPSHOT_BATCH_SIZE.
+        concurrency (int): The number of concurrent upserts. Defaults to SNAPSHOT_CONCURRENCY.
+
+    Returns:
+        int: The number of imported vectors.
+    """
+    def upsert(record_batch: pa.RecordBatch) -> int:
+        columns = record_batch.to_pydict()
+        metadatas = [json.loads(metadata) for metadata in columns["metadata"]]
+        # Targets retry on their own (PineconeWriter has its own backoff policy)
+        target.upsert(columns["id"], columns["values"], columns["text"], metadatas)
+        return record_batch.num_rows
+
+    imported = 0
+    start = time.perf_counter()
+    parquet_file = pq.ParquetFile(input_path)
+    with ThreadPoolExecutor(concurrency) as executor:
+        # Keep at most `concurrency` batches in flight, so memory stays bounded on large snapshots
+        for window in _batched(parquet_file.iter_batches(batch_size=batch_size), concurrency):
+            imported += sum(executor.map(upsert, window))
+            logger.info(f"📥 Imported {imported} vectors...")
+
+    logger.info(f"✅ Imported {imported} vectors in {time.perf_counter() - start:.1f}s")
+    return imported